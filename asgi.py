@@ -0,0 +1,343 @@
+# ASGI 배포용 진입점: uvicorn asgi:app --host 0.0.0.0 --port 5000
+# Flask 라우트는 a2wsgi 의 WSGIMiddleware(스레드 풀)로 그대로 서빙하고, 게임 루프(AsyncGameScheduler)와
+# 게임 상태 스트림(SSE)과 게임방 웹소켓은 서버의 이벤트 루프 하나에서 코루틴으로 돈다.
+# 구독자 하나가 스레드를 붙잡지 않으므로 스트림과 진행 중인 게임이 많아도 스레드 수는 그대로다.
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+os.environ.setdefault('GAME_ENGINE', 'asyncio')
+
+from a2wsgi import WSGIMiddleware
+from itsdangerous import BadSignature
+from werkzeug.http import parse_cookie
+
+from complete_game import (
+    app as flask_app, game_scheduler, game_sessions, state_change_listeners,
+    cleanup_old_sessions, encoded_status, find_room, init_game_session, run_game_command, stream_identity,
+    versioned_status,
+    GAME_COMMANDS, STATUS_BUILDERS, STREAM_KEEPALIVE, STREAM_SHARED_POLL
+)
+
+logger = logging.getLogger(__name__)
+
+STREAM_PATH = re.compile(r'^/api/([a-z]+)/stream$')
+SOCKET_PATH = re.compile(r'^/api/([a-z]+)/ws$')
+ROOM_STREAM_PATH = re.compile(r'^/api/room/([A-Za-z0-9]+)/stream$')
+CLEANUP_INTERVAL = 300
+# Flask 핸들러를 돌리는 스레드 수. 스트림은 이벤트 루프에서 처리하므로 짧은 요청만 이 풀을 쓴다
+WSGI_THREADS = int(os.environ.get('WSGI_THREADS', 10))
+
+wsgi_app = WSGIMiddleware(flask_app, workers=WSGI_THREADS)
+
+
+class StateSubscribers:
+    # (세션 ID, 게임 종류) 별 스트림 구독자의 asyncio.Event 모음.
+    # mark_state_changed 는 Flask 핸들러 스레드나 게임 루프에서 불리므로 이벤트 루프로 넘겨서 깨운다.
+
+    def __init__(self):
+        self._loop = None
+        self._events = defaultdict(set)
+
+    def attach(self, loop):
+        self._loop = loop
+
+    def subscribe(self, key):
+        event = asyncio.Event()
+        self._events[key].add(event)
+        return event
+
+    def unsubscribe(self, key, event):
+        events = self._events.get(key)
+        if events is not None:
+            events.discard(event)
+            if not events:
+                del self._events[key]
+
+    def publish(self, game_session):
+        key = (game_session.session_id, game_session.game_type)
+        if self._loop is not None and key in self._events:
+            self._loop.call_soon_threadsafe(self._wake, key)
+
+    def _wake(self, key):
+        for event in self._events.get(key, ()):
+            event.set()
+
+
+subscribers = StateSubscribers()
+state_change_listeners.append(subscribers.publish)
+
+
+def attach(loop):
+    game_scheduler.attach(loop)
+    subscribers.attach(loop)
+
+
+def request_session_id(scope):
+    # Flask 세션 쿠키를 같은 서명 키로 풀어서 세션 ID 만 꺼낸다. 쿠키가 없으면 Flask 쪽으로 넘겨 새로 발급받게 한다.
+    for name, value in scope['headers']:
+        if name == b'cookie':
+            cookie = parse_cookie(value.decode('latin-1')).get(flask_app.config['SESSION_COOKIE_NAME'])
+            break
+    else:
+        return None
+    if not cookie:
+        return None
+    serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+    try:
+        return serializer.loads(cookie, max_age=int(flask_app.permanent_session_lifetime.total_seconds())).get('session_id')
+    except BadSignature:
+        return None
+
+
+def same_origin(scope):
+    # 다른 사이트의 페이지가 사용자의 세션 쿠키로 게임방 웹소켓을 열어 명령을 보내지 못하게
+    # Origin 의 호스트가 요청 Host 와 같을 때만 받는다. 브라우저는 웹소켓 연결에 항상 Origin 을 보내고,
+    # Origin 이 없는 비브라우저 클라이언트는 세션 쿠키만으로 확인한다.
+    headers = dict(scope['headers'])
+    origin = headers.get(b'origin')
+    if origin is None:
+        return True
+    return urlsplit(origin.decode('latin-1')).netloc == headers.get(b'host', b'').decode('latin-1')
+
+
+async def load_game_session(session_id, game_type):
+    # 공유 저장소 조회는 SQLite 를 읽으므로 이벤트 루프를 막지 않게 스레드에서 한다
+    if game_sessions.shared:
+        return await asyncio.to_thread(init_game_session, session_id, game_type)
+    return init_game_session(session_id, game_type)
+
+
+async def load_room(code):
+    if game_sessions.shared:
+        return await asyncio.to_thread(find_room, code)
+    return find_room(code)
+
+
+async def locked_step(func, *args):
+    # 공유 저장소에서는 Flask 스레드가 세션 락을 쥔 채 SQLite 에 쓰는 동안(최대 busy timeout) 기다릴 수 있으므로
+    # 세션 락을 잡는 단계를 스레드에서 실행해 다른 스트림·웹소켓·게임 루프가 함께 멈추지 않게 한다
+    if game_sessions.shared:
+        return await asyncio.to_thread(func, *args)
+    return func(*args)
+
+
+def stream_frame(game_session, build_status):
+    with game_session.lock:
+        return encoded_status(game_session, build_status), game_session.next_frame_delay(time.time())
+
+
+def socket_frame(game_session, build_status, sent, sent_version):
+    with game_session.lock:
+        identity = stream_identity(game_session)
+        status = versioned_status(game_session, build_status, sent_version) if identity != sent else None
+        return identity, status, game_session.next_frame_delay(time.time())
+
+
+async def status_stream(game_session, reload, receive, send):
+    # complete_game.status_events 와 같은 프레임을 보내되, 기다리는 동안 스레드 대신 코루틴이 잠든다.
+    # 프레임은 encoded_status 가 버전마다 한 번 만든 바이트라서 같은 게임을 보는 스트림이 몇 개든 인코딩은 한 번이다.
+    # reload 는 상태 변경을 기다리다 시간이 다 되면 게임 세션을 다시 읽는 코루틴 함수 (관전방이 닫히면 None 을 돌려줘
+    # 스트림이 끝난다). 다시 읽을 필요가 없으면 reload 자리에 None 을 넘긴다
+    build_status = STATUS_BUILDERS[game_session.game_type]
+    wait_timeout = STREAM_SHARED_POLL if game_sessions.shared else STREAM_KEEPALIVE
+    key = (game_session.session_id, game_session.game_type)
+    changed = subscribers.subscribe(key)
+    disconnected = asyncio.ensure_future(receive_disconnect(receive))
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no')
+        ]
+    })
+    try:
+        await send_body(send, b'retry: 2000\n\n')
+        sent = None
+        idle = 0
+        while game_session is not None:
+            # 알림을 놓치지 않도록 상태를 보기 전에 이벤트를 비운다
+            changed.clear()
+            encoded, frame_delay = await locked_step(stream_frame, game_session, build_status)
+            if encoded.identity != sent:
+                sent = encoded.identity
+                idle = 0
+                await send_body(send, encoded.event)
+                continue
+
+            timeout = wait_timeout if frame_delay is None else min(wait_timeout, frame_delay)
+            done = await wait_changed(changed, disconnected, timeout)
+            if disconnected in done:
+                return
+            if done:
+                continue
+
+            if reload is not None:
+                game_session = await reload()
+            idle += timeout
+            if idle >= STREAM_KEEPALIVE:
+                idle = 0
+                await send_body(send, b': keepalive\n\n')
+    finally:
+        disconnected.cancel()
+        subscribers.unsubscribe(key, changed)
+
+
+async def wait_changed(changed, other, timeout):
+    # 상태 변경 알림과 다른 future(연결 종료·받은 메시지) 중 먼저 끝난 것을 돌려준다. 시간이 다 되면 빈 집합
+    waiting = asyncio.ensure_future(changed.wait())
+    done, _ = await asyncio.wait((waiting, other), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+    waiting.cancel()
+    return done
+
+
+def run_command(session_id, game_type, message):
+    # 웹소켓으로 받은 명령을 HTTP POST 와 같은 명령 함수로 처리한다 (스레드에서 실행)
+    handler = GAME_COMMANDS[game_type].get(message.get('command'))
+    if handler is None:
+        return {'success': False, 'message': '알 수 없는 명령입니다.'}
+    data = message.get('data')
+    try:
+        return run_game_command(handler, session_id, game_type, data if isinstance(data, dict) else {})
+    except Exception:
+        logger.exception('game command failed')
+        return {'success': False}
+
+
+async def game_socket(session_id, game_type, receive, send):
+    # 게임방 하나에 웹소켓 하나: 명령을 받아 결과를 돌려주고, 상태가 바뀌면 마지막으로 보낸 버전 이후의
+    # 변경분(versioned_status)을 밀어준다.
+    #   받는 메시지: {"id": 1, "command": "add_player", "data": {"name": "..."}}
+    #   보내는 메시지: {"type": "result", "id": 1, "result": {...}}
+    #                  {"type": "state", "version": 3, "full": true, "state": {...}} 또는 변경분
+    if (await receive())['type'] != 'websocket.connect':
+        return
+    await send({'type': 'websocket.accept'})
+
+    build_status = STATUS_BUILDERS[game_type]
+    wait_timeout = STREAM_SHARED_POLL if game_sessions.shared else None
+    key = (session_id, game_type)
+    game_session = await load_game_session(session_id, game_type)
+    changed = subscribers.subscribe(key)
+    receiving = asyncio.ensure_future(receive())
+    sent = None
+    sent_version = -1
+    try:
+        while True:
+            changed.clear()
+            identity, status, frame_delay = await locked_step(socket_frame, game_session, build_status, sent, sent_version)
+            if status is not None:
+                sent = identity
+                sent_version = status['version']
+                await send_json(send, {'type': 'state', **status})
+                continue
+
+            if frame_delay is None:
+                timeout = wait_timeout
+            else:
+                timeout = frame_delay if wait_timeout is None else min(wait_timeout, frame_delay)
+            done = await wait_changed(changed, receiving, timeout)
+            if receiving in done:
+                message = receiving.result()
+                if message['type'] == 'websocket.disconnect':
+                    return
+                receiving = asyncio.ensure_future(receive())
+                try:
+                    command = json.loads(message.get('text') or message.get('bytes') or '')
+                except ValueError:
+                    continue
+                if not isinstance(command, dict):
+                    continue
+                result = await asyncio.to_thread(run_command, session_id, game_type, command)
+                await send_json(send, {'type': 'result', 'id': command.get('id'), 'result': result})
+                # 명령이 세션을 새로 만들었을 수 있으므로 (만료 후 재생성, 공유 저장소 갱신) 다시 잡는다
+                game_session = await load_game_session(session_id, game_type)
+            elif not done and game_sessions.shared:
+                game_session = await load_game_session(session_id, game_type)
+    finally:
+        receiving.cancel()
+        subscribers.unsubscribe(key, changed)
+
+
+async def send_json(send, message):
+    await send({'type': 'websocket.send', 'text': json.dumps(message, ensure_ascii=False, separators=(',', ':'))})
+
+
+async def receive_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def send_body(send, body):
+    await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+
+
+async def periodic_cleanup():
+    while True:
+        await asyncio.sleep(CLEANUP_INTERVAL)
+        await asyncio.to_thread(cleanup_old_sessions)
+
+
+async def lifespan(receive, send):
+    cleanup = None
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            attach(asyncio.get_running_loop())
+            cleanup = asyncio.ensure_future(periodic_cleanup())
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if cleanup is not None:
+                cleanup.cancel()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+
+    # lifespan 을 끈 서버에서도 첫 요청에서 이벤트 루프를 붙인다
+    attach(asyncio.get_running_loop())
+    if scope['type'] == 'websocket':
+        match = SOCKET_PATH.match(scope['path'])
+        session_id = request_session_id(scope)
+        if match and match.group(1) in STATUS_BUILDERS and session_id is not None and same_origin(scope):
+            await game_socket(session_id, match.group(1), receive, send)
+        else:
+            # 세션 쿠키가 없거나 다른 사이트에서 연 연결은 거절한다. 브라우저는 HTTP 로 명령을 보낸다
+            await receive()
+            await send({'type': 'websocket.close', 'code': 1008})
+        return
+
+    if scope['type'] == 'http':
+        match = STREAM_PATH.match(scope['path'])
+        if match and match.group(1) in STATUS_BUILDERS:
+            session_id = request_session_id(scope)
+            if session_id is not None:
+                game_type = match.group(1)
+                game_session = await load_game_session(session_id, game_type)
+                # 메모리 저장소에서는 들고 있는 세션 객체가 곧 최신 상태다
+                reload = (lambda: load_game_session(session_id, game_type)) if game_sessions.shared else None
+                await status_stream(game_session, reload, receive, send)
+                return
+
+        match = ROOM_STREAM_PATH.match(scope['path'])
+        if match:
+            code = match.group(1)
+            game_session = await load_room(code)
+            # 없는 방은 Flask 쪽에서 404 로 응답한다. 방장 세션이 만료되면 저장소와 상관없이 스트림을 끝내도록
+            # 기다릴 때마다 방을 다시 찾는다
+            if game_session is not None:
+                await status_stream(game_session, lambda: load_room(code), receive, send)
+                return
+    await wsgi_app(scope, receive, send)
@@ -0,0 +1,74 @@
+# 세션 하나가 차지하는 메모리를 예전 dict 구조와 __slots__ 클래스 구조로 비교한다.
+# 사용법: python bench_session_memory.py [세션 수]
+import sys
+import threading
+import tracemalloc
+import uuid
+from collections import OrderedDict
+
+from complete_game import new_game_session
+from game_state import DicePlayer, RoulettePlayer, HorsePlayer, LadderPlayer, LADDER_EFFECTS
+
+# 게임별 최대 인원까지 채워서 잰다
+PLAYER_COUNTS = {'dice': 7, 'roulette': 10, 'horse': 10, 'ladder': 10}
+PLAYER_CLASSES = {'dice': DicePlayer, 'roulette': RoulettePlayer, 'horse': HorsePlayer, 'ladder': LadderPlayer}
+
+
+def fill_players(game_session, game_type):
+    player_class = PLAYER_CLASSES[game_type]
+    while len(game_session.players) < PLAYER_COUNTS[game_type]:
+        n = len(game_session.players)
+        if player_class is LadderPlayer:
+            game_session.players.append(LadderPlayer(f'플레이어{n + 1}', '#ff6b6b', n))
+        else:
+            game_session.players.append(player_class(f'플레이어{n + 1}', '#ff6b6b'))
+    return game_session
+
+
+def build_slots(game_type, session_id):
+    return fill_players(new_game_session(game_type, session_id), game_type)
+
+
+def build_dict(game_type, session_id):
+    # 클래스 도입 전 구조: 세션과 플레이어가 모두 dict 이고, 사다리 효과 키는 게임 중에 붙고
+    # 결과 목록은 세션마다 새 리스트였다
+    data = build_slots(game_type, session_id).to_json()
+    if game_type == 'ladder':
+        data['results'] = list(data['results'])
+        for player in data['players']:
+            player.update((effect, 0) for effect in LADDER_EFFECTS)
+    lock = threading.RLock()
+    data.update({
+        'state_id': uuid.uuid4().hex[:12],
+        'lock': lock,
+        'state_changed': threading.Condition(lock),
+        'status_history': OrderedDict()
+    })
+    return data
+
+
+def measure(build, game_type, count):
+    # 세션 ID 문자열은 두 구조가 같으므로 미리 만들어 두고 측정에서 뺀다
+    session_ids = [str(uuid.uuid4()) for _ in range(count)]
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    sessions = [build(game_type, sid) for sid in session_ids]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    total = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    del sessions
+    return total / count
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    print(f'{"game":<10}{"players":>8}{"dict B/session":>16}{"slots B/session":>17}{"saved":>8}')
+    for game_type in PLAYER_COUNTS:
+        dict_bytes = measure(build_dict, game_type, count)
+        slot_bytes = measure(build_slots, game_type, count)
+        saved = 1 - slot_bytes / dict_bytes
+        print(f'{game_type:<10}{PLAYER_COUNTS[game_type]:>8}{dict_bytes:>16.0f}{slot_bytes:>17.0f}{saved:>8.0%}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,19 +1,57 @@
-from flask import Flask, request, jsonify, session
-import random
+from flask import Flask, request, jsonify, session, Response, abort, send_from_directory
+import json
 import time
 import threading
 import uuid
-from collections import defaultdict
-import gc
-from threading import Lock
+from collections import defaultdict, namedtuple
+import gzip
+import hashlib
+import os
+import random
+import secrets
+import tempfile
+from types import MappingProxyType
+
+from game_scheduler import AsyncGameScheduler, GameScheduler
+from game_state import (
+    SESSION_CLASSES, DicePlayer, RoulettePlayer, HorsePlayer, LadderPlayer,
+    DiceSession, RouletteSession, HorseSession, LadderSession,
+    DEFAULT_ROSTERS, DICE_COLORS, RACE_COLORS, LADDER_COLORS,
+    LADDER_MAX_PLAYERS, LADDER_RESULTS, RESULT_WIN
+)
+from game_timeline import dice_rounds
+from gc_tuning import gc_pause_tracker, tune_gc
+from session_store import ShardedSessionStore, SqliteSessionStore
 
-app = Flask(__name__, static_folder='static', static_url_path='/static')
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 정적 파일은 지문(해시)이 붙은 URL 로 서빙하기 위해 static_files 라우트에서 직접 처리한다
+app = Flask(__name__, static_folder=None)
 app.secret_key = 'random_games_secret_key_2024'
 
-game_sessions = {}
-session_lock = Lock()
 MAX_SESSIONS = 500
 SESSION_TIMEOUT = 3600
+SESSION_SHARDS = int(os.environ.get('SESSION_SHARDS', 8))
+# memory: 프로세스 메모리(워커 1개용), sqlite: 같은 호스트의 여러 gunicorn 워커가 공유
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'memory')
+SESSION_DB_PATH = os.environ.get('SESSION_DB_PATH', os.path.join(tempfile.gettempdir(), 'random_game_sessions.sqlite3'))
+STATUS_HISTORY = 16
+# thread: WSGI 서버(gunicorn 등)용 워커 스레드 스케줄러, asyncio: asgi.py 로 띄울 때 서버 이벤트 루프에서 구동
+GAME_ENGINE = os.environ.get('GAME_ENGINE', 'thread')
+# 벤치마크·재현용: 1 이면 start_game 명령의 seed 를 받아들인다. 기본값에서는 결과를 미리 정할 수 없도록 서버만 시드를 정한다
+ALLOW_CLIENT_SEED = os.environ.get('ALLOW_CLIENT_SEED') == '1'
+
+# 모든 게임 루프는 공용 스케줄러에서 틱 단위로 실행된다
+if GAME_ENGINE == 'asyncio':
+    game_scheduler = AsyncGameScheduler(offload_steps=SESSION_BACKEND == 'sqlite')
+else:
+    game_scheduler = GameScheduler(workers=int(os.environ.get('GAME_SCHEDULER_WORKERS', 2)))
+
+# 상태가 바뀐 게임 세션을 받는 콜백 목록. 스레드 밖의 구독자(asgi.py 의 이벤트 루프 스트림)가 등록한다
+state_change_listeners = []
 
 def get_session_id():
     if 'session_id' not in session:
@@ -21,1102 +59,1047 @@ def get_session_id():
     return session['session_id']
 
 def cleanup_old_sessions():
-    current_time = time.time()
-    with session_lock:
-        expired_sessions = []
-        for sid, data in game_sessions.items():
-            if current_time - data.get('last_activity', 0) > SESSION_TIMEOUT:
-                expired_sessions.append(sid)
-        
-        for sid in expired_sessions:
-            del game_sessions[sid]
-        
-        if expired_sessions:
-            gc.collect()
+    # 세션 데이터에는 순환 참조가 없어서 만료된 세션은 참조 카운트만으로 바로 해제된다
+    game_sessions.expire()
+
+def new_game_session(game_type, session_id):
+    roster = DEFAULT_ROSTERS[game_type]
+    if game_type == 'dice':
+        return DiceSession(session_id, [DicePlayer(name, color) for name, color in roster])
+    elif game_type == 'roulette':
+        return RouletteSession(session_id, [RoulettePlayer(name, color) for name, color in roster])
+    elif game_type == 'horse':
+        return HorseSession(session_id, [HorsePlayer(name, color) for name, color in roster])
+    else:  # ladder
+        players = [LadderPlayer(name, color, lane) for lane, (name, color) in enumerate(roster)]
+        game_session = LadderSession(session_id, players)
+        game_session.results = draw_ladder_results(game_session)
+        return game_session
+
+# 사다리 결과 배치는 게임 시작 전에 화면에 보이는 값이라 시드와 무관하게 공용 생성기에서 뽑는다.
+# 세션마다 난수 생성기를 만들지 않으므로 게임을 하지 않는 세션은 생성기 상태를 들고 있지 않는다
+ladder_random = random.SystemRandom()
+
+def draw_ladder_results(game_session):
+    # 결과 목록은 새로 만들지 않고 미리 만들어 둔 튜플 중 하나를 고른다
+    player_count = len(game_session.players)
+    return LADDER_RESULTS[player_count][ladder_random.randrange(player_count)]
+
+def requested_seed(data):
+    # 재생·부하 테스트용: ALLOW_CLIENT_SEED=1 일 때만 start_game 명령의 seed 로 게임을 시작한다
+    if not ALLOW_CLIENT_SEED:
+        return None
+    seed = data.get('seed')
+    return seed if isinstance(seed, int) and not isinstance(seed, bool) else None
+
+def dump_game_session(game_session):
+    return game_session.to_json()
+
+def load_game_session(data):
+    return SESSION_CLASSES[data['game_type']].from_json(data)
+
+def identify_game_session(game_session):
+    return game_session.state_id, game_session.version
+
+# 게임 상태는 (세션 ID, 게임 종류) 로 저장되고 스케줄러 루프도 같은 키를 쓴다.
+# 세션이 밀려나거나 만료되면 그 세션의 게임 루프도 같은 키로 취소된다
+if SESSION_BACKEND == 'sqlite':
+    game_sessions = SqliteSessionStore(
+        SESSION_DB_PATH, MAX_SESSIONS, SESSION_TIMEOUT,
+        dump_game_session, load_game_session, identify_game_session,
+        on_evict=game_scheduler.cancel
+    )
+else:
+    # 세션 ID 로 샤딩된 LRU 저장소
+    game_sessions = ShardedSessionStore(SESSION_SHARDS, MAX_SESSIONS, SESSION_TIMEOUT, on_evict=game_scheduler.cancel)
 
 def init_game_session(session_id, game_type):
-    with session_lock:
-        if len(game_sessions) >= MAX_SESSIONS:
-            cleanup_old_sessions()
-            if len(game_sessions) >= MAX_SESSIONS:
-                oldest_session = min(game_sessions.items(), key=lambda x: x[1].get('last_activity', 0))
-                del game_sessions[oldest_session[0]]
-        
-        if session_id not in game_sessions:
-            if game_type == 'dice':
-                players = [
-                    {"name": "플레이어1", "color": "#ff6b6b", "dice1": 0, "dice2": 0, "total": 0},
-                    {"name": "플레이어2", "color": "#4ecdc4", "dice1": 0, "dice2": 0, "total": 0},
-                    {"name": "플레이어3", "color": "#45b7d1", "dice1": 0, "dice2": 0, "total": 0},
-                    {"name": "플레이어4", "color": "#96ceb4", "dice1": 0, "dice2": 0, "total": 0}
-                ]
-                game_sessions[session_id] = {
-                    'game_type': 'dice',
-                    'players': players,
-                    'game_running': False,
-                    'current_player': 0,
-                    'dice_rolling': False,
-                    'game_finished': False,
-                    'winner': None,
-                    'round_number': 1,
-                    'tie_breaker_players': [],
-                    'is_tie_breaker': False,
-                    'last_activity': time.time()
-                }
-            elif game_type == 'roulette':
-                players = [
-                    {"name": "플레이어1", "color": "#ff6b6b"},
-                    {"name": "플레이어2", "color": "#4ecdc4"},
-                    {"name": "플레이어3", "color": "#45b7d1"},
-                    {"name": "플레이어4", "color": "#96ceb4"}
-                ]
-                game_sessions[session_id] = {
-                    'game_type': 'roulette',
-                    'players': players,
-                    'game_running': False,
-                    'roulette_spinning': False,
-                    'game_finished': False,
-                    'winner': None,
-                    'winner_index': -1,
-                    'spin_angle': 0,
-                    'last_activity': time.time()
-                }
-            elif game_type == 'horse':
-                players = [
-                    {"name": "말1", "color": "#FF0000", "position": 0, "speed": 0},
-                    {"name": "말2", "color": "#00FF00", "position": 0, "speed": 0},
-                    {"name": "말3", "color": "#0080FF", "position": 0, "speed": 0},
-                    {"name": "말4", "color": "#FFFF00", "position": 0, "speed": 0}
-                ]
-                game_sessions[session_id] = {
-                    'game_type': 'horse',
-                    'players': players,
-                    'game_running': False,
-                    'race_started': False,
-                    'game_finished': False,
-                    'winner': None,
-                    'winner_index': -1,
-                    'game_mode': 'first',
-                    'race_time': 0,
-                    'last_activity': time.time()
-                }
-            else:  # ladder
-                players = [
-                    {"name": "플레이어1", "position": 0, "color": "#ff6b6b", "lane": 0, "speed": 1.0},
-                    {"name": "플레이어2", "position": 0, "color": "#4ecdc4", "lane": 1, "speed": 1.0},
-                    {"name": "플레이어3", "position": 0, "color": "#45b7d1", "lane": 2, "speed": 1.0},
-                    {"name": "플레이어4", "position": 0, "color": "#96ceb4", "lane": 3, "speed": 1.0},
-                    {"name": "플레이어5", "position": 0, "color": "#ffeaa7", "lane": 4, "speed": 1.0}
-                ]
-                results = ['통과'] * 5
-                winner_index = random.randint(0, 4)
-                results[winner_index] = '당첨'
-                game_sessions[session_id] = {
-                    'game_type': 'ladder',
-                    'players': players,
-                    'ladder_connections': [],
-                    'results': results,
-                    'game_running': False,
-                    'last_activity': time.time()
-                }
-        else:
-            game_sessions[session_id]['last_activity'] = time.time()
-        
-        return game_sessions[session_id]
+    # 게임 상태는 해당 게임 API 가 처음 불릴 때 만들어진다
+    return game_sessions.get_or_create(session_id, game_type, lambda: new_game_session(game_type, session_id))
 
 def get_game_session(game_type='dice'):
     session_id = get_session_id()
     return init_game_session(session_id, game_type)
 
+def players_json(players):
+    return [player.to_json() for player in players]
+
+def player_json(player):
+    return player.to_json() if player is not None else None
+
+def snapshot_value(value):
+    if isinstance(value, dict):
+        return {k: snapshot_value(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [snapshot_value(v) for v in value]
+    return value
+
+def status_delta(before, after):
+    # 바뀐 필드만 추린다. 플레이어 수가 같으면 플레이어별로 바뀐 필드만 보낸다
+    changes = {}
+    players = {}
+    for key, value in after.items():
+        if key == 'players' and len(before.get('players', [])) == len(value):
+            for i, (old_player, new_player) in enumerate(zip(before['players'], value)):
+                diff = {k: v for k, v in new_player.items() if old_player.get(k) != v}
+                diff.update((k, None) for k in old_player if k not in new_player)
+                if diff:
+                    players[str(i)] = diff
+        elif before.get(key) != value:
+            changes[key] = value
+    return {'changes': changes, 'players': players}
+
+def versioned_status(game_session, build_status, since):
+    # 클라이언트에게 보낸 스냅샷을 버전별로 보관해 두고 since 이후의 변경분만 응답한다
+    with game_session.state_changed:
+        history = game_session.status_history
+        version = game_session.status_version
+        current = history.get(version)
+        if current is None:
+            current = snapshot_value(build_status(game_session))
+            history[version] = current
+            while len(history) > STATUS_HISTORY:
+                history.popitem(last=False)
+        base = history.get(since)
+    
+    if base is None:
+        return {'version': version, 'full': True, 'state': current}
+    return {'version': version, 'full': False, **status_delta(base, current)}
+
+def stream_identity(game_session):
+    game_session.advance(time.time())
+    return game_session.state_id, game_session.status_version
+
+# 상태 스냅샷: 버전(타임라인 게임은 프레임)마다 한 번만 JSON 으로 인코딩해서 세션에 보관한다.
+# 게임 상태 응답과 스트림(방장의 탭, 관전자 N명)은 같은 버전 동안 이 바이트를 그대로 보낸다
+EncodedStatus = namedtuple('EncodedStatus', ['identity', 'body', 'event'])
+
+def encoded_status(game_session, build_status):
+    with game_session.lock:
+        identity = stream_identity(game_session)
+        cached = game_session.encoded_status
+        if cached is None or cached.identity != identity:
+            body = json.dumps(build_status(game_session), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            cached = game_session.encoded_status = EncodedStatus(identity, body, b'data: ' + body + b'\n\n')
+        return cached
+
+def status_response(game_session, build_status):
+    # 버전이 그대로면 JSON 을 만들지 않고 304 로 응답한다.
+    # 타임라인 게임은 지금 시각의 프레임을 먼저 반영하므로 ETag 와 본문이 같은 프레임을 가리킨다.
+    # 전체 상태는 같은 틱 안에 폴링이 몇 번 오든 인코딩해 둔 스냅샷 바이트를 그대로 보낸다.
+    since = request.args.get('since', type=int)
+    with game_session.lock:
+        state_id, version = stream_identity(game_session)
+        etag = f"{state_id}-{version}"
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        elif since is not None:
+            response = jsonify(versioned_status(game_session, build_status, since))
+        else:
+            response = Response(encoded_status(game_session, build_status).body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def game_in_progress(game_session):
+    game_session.advance(time.time())
+    return game_session.game_running and not getattr(game_session, 'game_finished', False)
+
+def loop_owns(game_session, generation):
+    # 게임을 다시 시작하거나 리셋하면 세대가 바뀌어 이전 루프는 다음 틱에서 스스로 끝난다
+    return game_session.loop_generation == generation
+
+class StateConflict(Exception):
+    # 공유 저장소에서 다른 워커가 같은 게임 상태를 먼저 저장해서 이 사본의 변경이 버려졌다
+    pass
+
+def mark_state_changed(game_session):
+    # 상태가 바뀔 때마다 버전을 올리고 스트림 구독자를 깨운다.
+    # 저장이 밀리면 StateConflict 를 던진다 (명령은 최신 상태로 다시 실행하고, 게임 루프는 진행 상태를 옮겨 얹는다)
+    with game_session.state_changed:
+        game_session.version += 1
+        if not game_sessions.save(game_session.session_id, game_session.game_type, game_session):
+            raise StateConflict(game_session.session_id, game_session.game_type)
+        game_session.state_changed.notify_all()
+    for listener in state_change_listeners:
+        listener(game_session)
+
+# 개발용: TEMPLATE_RELOAD=1 이면 파일 수정 시각이 바뀐 템플릿을 다시 읽는다
+TEMPLATE_RELOAD = os.environ.get('TEMPLATE_RELOAD') == '1'
+
+# 정적 파일은 내용 해시를 파일명에 넣은 URL 로 노출하고 영구 캐시를 허용한다
+STATIC_DIR = os.path.join(app.root_path, 'static')
+STATIC_MAX_AGE = 31536000
+
+def fingerprint_static_files():
+    fingerprints = {}
+    if TEMPLATE_RELOAD:
+        # 개발 중에는 정적 파일도 고치는 대로 보여야 하므로 지문 없이 매번 재검증하는 URL 을 쓴다
+        return fingerprints
+    for root, _, files in os.walk(STATIC_DIR):
+        for filename in files:
+            path = os.path.join(root, filename)
+            relative = os.path.relpath(path, STATIC_DIR).replace(os.sep, '/')
+            with open(path, 'rb') as f:
+                digest = hashlib.sha256(f.read()).hexdigest()[:12]
+            stem, ext = os.path.splitext(relative)
+            fingerprints[relative] = f'{stem}.{digest}{ext}'
+    return fingerprints
+
+static_fingerprints = MappingProxyType(fingerprint_static_files())
+fingerprinted_static = MappingProxyType({v: k for k, v in static_fingerprints.items()})
+
+def static_url(filename):
+    return '/static/' + static_fingerprints.get(filename, filename)
+
+# 페이지 템플릿은 시작할 때 한 번 읽어서 인코딩·압축된 바이트로 보관한다
+TEMPLATE_FILES = {
+    'index': 'index_template.html',
+    'dice': 'dice_template.html',
+    'roulette': 'roulette_template.html',
+    'horse': 'horse_template.html',
+    'ladder': 'ladder_template.html'
+}
+
+CachedTemplate = namedtuple('CachedTemplate', ['filename', 'mtime', 'body', 'compressed', 'etag'])
+
+def compress_variants(body):
+    compressed = {'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        compressed['br'] = brotli.compress(body, quality=11)
+    return compressed
+
+def load_template(filename):
+    path = os.path.join(app.root_path, filename)
+    with open(path, 'rb') as f:
+        body = f.read()
+    # 템플릿의 정적 파일 경로는 모두 static_url 로 지문이 붙은 URL 로 바꾼다
+    for original in static_fingerprints:
+        body = body.replace(f'/static/{original}'.encode(), static_url(original).encode())
+    etag = hashlib.sha256(body).hexdigest()[:16]
+    return CachedTemplate(filename, os.path.getmtime(path), body, compress_variants(body), etag)
+
+_templates = {name: load_template(filename) for name, filename in TEMPLATE_FILES.items()}
+template_cache = MappingProxyType(_templates)
+
+def get_template(name):
+    cached = template_cache[name]
+    if TEMPLATE_RELOAD:
+        mtime = os.path.getmtime(os.path.join(app.root_path, cached.filename))
+        if mtime != cached.mtime:
+            cached = _templates[name] = load_template(cached.filename)
+    return cached
+
+def template_response(name):
+    # Accept-Encoding 에 맞춰 미리 압축해 둔 본문을 그대로 보낸다
+    cached = get_template(name)
+    encoding = request.accept_encodings.best_match([e for e in ('br', 'gzip') if e in cached.compressed])
+    body = cached.compressed[encoding] if encoding else cached.body
+    response = Response(body, mimetype='text/html')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Content-Length'] = str(len(body))
+    response.vary.add('Accept-Encoding')
+    response.set_etag(f'{cached.etag}-{encoding}' if encoding else cached.etag)
+    response.last_modified = cached.mtime
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
 @app.route('/static/<path:filename>')
 def static_files(filename):
-    from flask import send_from_directory
-    return send_from_directory('static', filename)
+    original = fingerprinted_static.get(filename)
+    if original is None:
+        # 지문 없는 예전 URL 은 매번 재검증하도록 둔다
+        return send_from_directory(STATIC_DIR, filename)
+    response = send_from_directory(STATIC_DIR, original, max_age=STATIC_MAX_AGE)
+    response.headers['Cache-Control'] = f'public, max-age={STATIC_MAX_AGE}, immutable'
+    return response
+
+@app.route('/api/metrics')
+def metrics():
+    return jsonify({
+        'sessions': game_sessions.stats(),
+        'scheduler': game_scheduler.stats(),
+        'gc': gc_pause_tracker.stats()
+    })
 
 @app.route('/')
 def index():
-    return '''<!DOCTYPE html>
-<html>
-<head>
-    <title>🎮 랜덤 게임 선택</title>
-    <meta charset="utf-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <script async src="https://pagead2.googlesyndication.com/pagead/js/adsbygoogle.js?client=ca-pub-9882928075571455"
-         crossorigin="anonymous"></script>
-    <style>
-        * { margin: 0; padding: 0; box-sizing: border-box; }
-        body { 
-            font-family: Arial, sans-serif; 
-            background: linear-gradient(135deg, #0c0c0c, #1a1a1a, #2d2d30);
-            color: #e0e0e0; 
-            min-height: 100vh;
-            padding: 10px;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-        }
-        .container { max-width: 800px; margin: 0 auto; text-align: center; }
-        .header { margin-bottom: 50px; }
-        .header h1 { font-size: clamp(2.5em, 10vw, 4em); margin-bottom: 20px; }
-        .game-selection {
-            display: grid;
-            grid-template-columns: repeat(2, 1fr);
-            gap: 30px;
-            margin: 40px 0;
-            max-width: 1000px;
-            margin: 40px auto;
-        }
-        .game-card {
-            background: rgba(0,0,0,0.4);
-            padding: 40px 30px;
-            border-radius: 25px;
-            cursor: pointer;
-            transition: all 0.3s ease;
-            border: 3px solid transparent;
-        }
-        .game-card:hover {
-            transform: translateY(-10px);
-            box-shadow: 0 20px 40px rgba(0,0,0,0.5);
-        }
-        .dice-card {
-            border-color: #4ecdc4;
-            background: linear-gradient(135deg, rgba(78, 205, 196, 0.1), rgba(0,0,0,0.4));
-        }
-        .dice-card:hover {
-            border-color: #4ecdc4;
-            box-shadow: 0 20px 40px rgba(78, 205, 196, 0.3);
-        }
-        .roulette-card {
-            border-color: #ff6b6b;
-            background: linear-gradient(135deg, rgba(255, 107, 107, 0.1), rgba(0,0,0,0.4));
-        }
-        .roulette-card:hover {
-            border-color: #ff6b6b;
-            box-shadow: 0 20px 40px rgba(255, 107, 107, 0.3);
-        }
-        .horse-card {
-            border-color: #f39c12;
-            background: linear-gradient(135deg, rgba(243, 156, 18, 0.1), rgba(0,0,0,0.4));
-        }
-        .horse-card:hover {
-            border-color: #f39c12;
-            box-shadow: 0 20px 40px rgba(243, 156, 18, 0.3);
-        }
-        .ladder-card {
-            border-color: #9b59b6;
-            background: linear-gradient(135deg, rgba(155, 89, 182, 0.1), rgba(0,0,0,0.4));
-        }
-        .ladder-card:hover {
-            border-color: #9b59b6;
-            box-shadow: 0 20px 40px rgba(155, 89, 182, 0.3);
-        }
-        .game-icon {
-            font-size: 4em;
-            margin-bottom: 20px;
-        }
-        .game-title {
-            font-size: 1.8em;
-            font-weight: bold;
-            margin-bottom: 15px;
-        }
-        .game-description {
-            font-size: 1.1em;
-            opacity: 0.8;
-            line-height: 1.5;
-        }
-        @media (max-width: 768px) {
-            .game-selection { grid-template-columns: repeat(2, 1fr); gap: 15px; }
-            .game-card { padding: 20px 15px; }
-            .game-icon { font-size: 2.5em; }
-            .game-title { font-size: 1.2em; }
-            .game-description { font-size: 0.9em; }
-        }
-        @media (max-width: 480px) {
-            .game-selection { gap: 10px; }
-            .game-card { padding: 15px 10px; }
-            .game-icon { font-size: 2em; }
-            .game-title { font-size: 1.1em; }
-            .game-description { font-size: 0.8em; line-height: 1.3; }
-        }
-    </style>
-</head>
-<body>
-    <div class="container">
-        <div class="header">
-            <h1>🎮 랜덤 게임</h1>
-            <p>원하는 게임을 선택하세요!</p>
-        </div>
-        
-        <div class="game-selection">
-            <div class="game-card horse-card" onclick="selectGame('horse')">
-                <div class="game-icon">🏇</div>
-                <div class="game-title">랜덤 경마 게임</div>
-                <div class="game-description">
-                    박진감 넘치는 경마!<br>
-                    순위가 뒤바뀌는<br>
-                    스릴 만점 레이스!
-                </div>
-            </div>
-            
-            <div class="game-card ladder-card" onclick="selectGame('ladder')">
-                <div class="game-icon">🪜</div>
-                <div class="game-title">랜덤 사다리 게임</div>
-                <div class="game-description">
-                    사다리를 타고 내려가서<br>
-                    랜덤한 결과를<br>
-                    확인하는 게임!
-                </div>
-            </div>
-            
-            <div class="game-card dice-card" onclick="selectGame('dice')">
-                <div class="game-icon">🎲</div>
-                <div class="game-title">랜덤 주사위 게임</div>
-                <div class="game-description">
-                    주사위 2개를 굴려서<br>
-                    가장 낮은 합계가 나온<br>
-                    플레이어가 승리!
-                </div>
-            </div>
-            
-            <div class="game-card roulette-card" onclick="selectGame('roulette')">
-                <div class="game-icon">🎡</div>
-                <div class="game-title">랜덤 룰렛 게임</div>
-                <div class="game-description">
-                    3D 룰렛을 돌려서<br>
-                    룰렛이 가리키는<br>
-                    플레이어가 승리!
-                </div>
-            </div>
-        </div>
-    </div>
-
-    <script>
-        function selectGame(gameType) {
-            if (gameType === 'dice') {
-                window.location.href = '/dice';
-            } else if (gameType === 'roulette') {
-                window.location.href = '/roulette';
-            } else if (gameType === 'horse') {
-                window.location.href = '/horse';
-            } else if (gameType === 'ladder') {
-                window.location.href = '/ladder';
-            }
-        }
-    </script>
-</body>
-</html>'''
+    return template_response('index')
 
 @app.route('/dice')
 def dice_game():
-    # 새로운 세션 생성으로 데이터 초기화
-    session_id = get_session_id()
-    if session_id in game_sessions:
-        del game_sessions[session_id]
-    return open('dice_template.html', 'r', encoding='utf-8').read()
+    # 페이지의 웹소켓이 바로 연결되도록 세션 쿠키를 먼저 발급한다
+    get_session_id()
+    return template_response('dice')
 
 @app.route('/roulette')
 def roulette_game():
-    # 새로운 세션 생성으로 데이터 초기화
-    session_id = get_session_id()
-    if session_id in game_sessions:
-        del game_sessions[session_id]
-    return open('roulette_template.html', 'r', encoding='utf-8').read()
+    get_session_id()
+    return template_response('roulette')
 
 @app.route('/horse')
 def horse_game():
-    # 새로운 세션 생성으로 데이터 초기화
-    session_id = get_session_id()
-    if session_id in game_sessions:
-        del game_sessions[session_id]
-    return open('horse_template.html', 'r', encoding='utf-8').read()
+    get_session_id()
+    return template_response('horse')
 
 @app.route('/ladder')
 def ladder_game():
-    # 새로운 세션 생성으로 데이터 초기화
-    session_id = get_session_id()
-    if session_id in game_sessions:
-        del game_sessions[session_id]
-    return open('ladder_template.html', 'r', encoding='utf-8').read()
+    get_session_id()
+    return template_response('ladder')
+
+# 게임 조작 명령 (선수 추가·수정·삭제, 리셋, 시작 등).
+# 명령 함수는 (게임 세션, 요청 데이터) 를 받아 응답 dict 를 돌려주고, HTTP POST 와 웹소켓(asgi.py)이 같이 쓴다.
+GAME_COMMANDS = defaultdict(dict)
+
+def game_command(game_type, name):
+    def register(handler):
+        GAME_COMMANDS[game_type][name] = handler
+        return handler
+    return register
+
+# 다른 워커와 충돌했을 때 최신 상태를 다시 읽어 명령을 다시 적용하는 횟수
+COMMAND_RETRIES = 3
+
+def run_game_command(handler, session_id, game_type, data):
+    for _ in range(COMMAND_RETRIES):
+        try:
+            return handler(init_game_session(session_id, game_type), data)
+        except StateConflict:
+            continue
+    return {'success': False, 'message': '다른 요청과 겹쳐서 처리하지 못했습니다. 다시 시도해 주세요.'}
+
+@app.route('/api/<game_type>/<command>', methods=['POST'])
+def game_command_request(game_type, command):
+    handler = GAME_COMMANDS.get(game_type, {}).get(command)
+    if handler is None:
+        abort(404)
+    return jsonify(run_game_command(handler, get_session_id(), game_type, request.get_json(silent=True) or {}))
+
+# 관전방: 방장이 진행하는 게임 하나를 방 코드로 여러 관전자가 함께 본다.
+# 관전자는 방장 세션의 게임 상태를 읽기만 하고, 상태 스트림은 같은 인코딩 결과를 모든 구독자에게 보낸다
+ROOM_CODE_CHARS = 'ABCDEFGHJKLMNPQRSTUVWXYZ23456789'
+ROOM_CODE_LENGTH = 6
+
+def new_room_code():
+    return ''.join(secrets.choice(ROOM_CODE_CHARS) for _ in range(ROOM_CODE_LENGTH))
+
+def open_room(game_session, data):
+    # 이미 연 방이 있으면 같은 코드를 돌려준다
+    with game_session.lock:
+        if game_session.room_code is None:
+            code = new_room_code()
+            while not game_sessions.add_room(code, game_session.session_id, game_session.game_type):
+                code = new_room_code()
+            game_session.room_code = code
+            mark_state_changed(game_session)
+        return {'success': True, 'code': game_session.room_code}
+
+for room_game_type in SESSION_CLASSES:
+    game_command(room_game_type, 'open_room')(open_room)
+
+def find_room(code):
+    return game_sessions.find_room(code.upper())
+
+def get_room(code):
+    game_session = find_room(code)
+    if game_session is None:
+        abort(404)
+    return game_session
+
+@app.route('/room/<code>')
+def room_page(code):
+    # 관전 페이지는 게임 페이지를 그대로 쓰고, 브라우저가 주소의 방 코드를 보고 관전 모드로 뜬다
+    return template_response(get_room(code).game_type)
+
+@app.route('/api/room/<code>')
+def room_info(code):
+    # 관전자가 시작 명령의 응답 대신 받는 값 (사다리 배치, 룰렛 회전을 맞출 서버 시각)
+    game_session = get_room(code)
+    with game_session.lock:
+        info = {'code': game_session.room_code, 'game_type': game_session.game_type, 'server_time': time.time()}
+        if game_session.game_type == 'ladder':
+            info['ladder_connections'] = game_session.ladder_connections
+        return jsonify(info)
+
+@app.route('/api/room/<code>/game_status')
+def room_game_status(code):
+    game_session = get_room(code)
+    return status_response(game_session, STATUS_BUILDERS[game_session.game_type])
 
 # 주사위 게임 API
 @app.route('/api/dice/players')
 def get_dice_players():
     game_session = get_game_session('dice')
-    return jsonify(game_session['players'])
+    with game_session.lock:
+        return jsonify(players_json(game_session.players))
 
-@app.route('/api/dice/add_player', methods=['POST'])
-def add_dice_player():
-    game_session = get_game_session('dice')
-    data = request.get_json()
+@game_command('dice', 'add_player')
+def add_dice_player(game_session, data):
     name = data.get('name', '').strip()
     
-    if not name:
-        return jsonify({'success': False, 'message': '이름을 입력하세요!'})
-    
-    if len(game_session['players']) >= 7:
-        return jsonify({'success': False, 'message': '최대 7명까지 가능합니다!'})
-    
-    colors = ["#ff6b6b", "#4ecdc4", "#45b7d1", "#96ceb4", "#ffeaa7", "#fd79a8", "#fdcb6e"]
-    
-    new_player = {
-        "name": name,
-        "color": colors[len(game_session['players']) % len(colors)],
-        "dice1": 0,
-        "dice2": 0,
-        "total": 0
-    }
-    
-    game_session['players'].append(new_player)
-    return jsonify({'success': True})
+    with game_session.lock:
+        if game_in_progress(game_session):
+            return {'success': False, 'message': '게임 진행 중에는 변경할 수 없습니다!'}
+        
+        if not name:
+            return {'success': False, 'message': '이름을 입력하세요!'}
+        
+        if len(game_session.players) >= 7:
+            return {'success': False, 'message': '최대 7명까지 가능합니다!'}
+        
+        new_player = DicePlayer(name, DICE_COLORS[len(game_session.players) % len(DICE_COLORS)])
+        
+        game_session.players.append(new_player)
+        mark_state_changed(game_session)
+        return {'success': True}
 
-@app.route('/api/dice/update_player', methods=['POST'])
-def update_dice_player():
-    game_session = get_game_session('dice')
-    data = request.get_json()
+@game_command('dice', 'update_player')
+def update_dice_player(game_session, data):
     index = data.get('index')
     name = data.get('name', '').strip()
     
-    if 0 <= index < len(game_session['players']) and name:
-        game_session['players'][index]['name'] = name
-        return jsonify({'success': True})
-    
-    return jsonify({'success': False})
+    with game_session.lock:
+        if 0 <= index < len(game_session.players) and name:
+            game_session.players[index].name = name
+            mark_state_changed(game_session)
+            return {'success': True}
+        
+        return {'success': False}
 
-@app.route('/api/dice/remove_player', methods=['POST'])
-def remove_dice_player():
-    game_session = get_game_session('dice')
-    data = request.get_json()
+@game_command('dice', 'remove_player')
+def remove_dice_player(game_session, data):
     index = data.get('index')
     
-    if len(game_session['players']) <= 2:
-        return jsonify({'success': False, 'message': '최소 2명의 플레이어가 필요합니다!'})
-    
-    if 0 <= index < len(game_session['players']):
-        game_session['players'].pop(index)
-        return jsonify({'success': True})
-    
-    return jsonify({'success': False})
+    with game_session.lock:
+        if game_in_progress(game_session):
+            return {'success': False, 'message': '게임 진행 중에는 변경할 수 없습니다!'}
+        
+        if len(game_session.players) <= 2:
+            return {'success': False, 'message': '최소 2명의 플레이어가 필요합니다!'}
+        
+        if 0 <= index < len(game_session.players):
+            game_session.players.pop(index)
+            mark_state_changed(game_session)
+            return {'success': True}
+        
+        return {'success': False}
 
-@app.route('/api/dice/reset', methods=['POST'])
-def reset_dice_game():
-    game_session = get_game_session('dice')
-    game_session['game_running'] = False
-    game_session['current_player'] = 0
-    game_session['dice_rolling'] = False
-    game_session['game_finished'] = False
-    game_session['winner'] = None
-    game_session['round_number'] = 1
-    game_session['tie_breaker_players'] = []
-    game_session['is_tie_breaker'] = False
-    
-    for player in game_session['players']:
-        player['dice1'] = 0
-        player['dice2'] = 0
-        player['total'] = 0
-    
-    return jsonify({'success': True})
+@game_command('dice', 'reset')
+def reset_dice_game(game_session, data):
+    with game_session.lock:
+        game_scheduler.cancel((game_session.session_id, 'dice'))
+        game_session.loop_generation += 1
+        game_session.game_running = False
+        game_session.current_player = 0
+        game_session.dice_rolling = False
+        game_session.game_finished = False
+        game_session.winner = None
+        game_session.round_number = 1
+        game_session.tie_breaker_players = []
+        game_session.is_tie_breaker = False
+        
+        for player in game_session.players:
+            player.reset()
+        
+        mark_state_changed(game_session)
+        return {'success': True}
 
-@app.route('/api/dice/start_game', methods=['POST'])
-def start_dice_game():
-    game_session = get_game_session('dice')
-    
-    if len(game_session['players']) < 2:
-        return jsonify({'success': False, 'message': '최소 2명의 플레이어가 필요합니다!'})
-    
-    game_session['game_running'] = True
-    game_session['current_player'] = 0
-    game_session['dice_rolling'] = False
-    game_session['game_finished'] = False
-    game_session['winner'] = None
-    game_session['round_number'] = 1
-    game_session['tie_breaker_players'] = []
-    game_session['is_tie_breaker'] = False
-    
-    for player in game_session['players']:
-        player['dice1'] = 0
-        player['dice2'] = 0
-        player['total'] = 0
-    
-    session_id = get_session_id()
-    threading.Thread(target=dice_game_loop, args=(session_id,), daemon=True).start()
-    
-    return jsonify({'success': True})
+@game_command('dice', 'start_game')
+def start_dice_game(game_session, data):
+    with game_session.lock:
+        if len(game_session.players) < 2:
+            return {'success': False, 'message': '최소 2명의 플레이어가 필요합니다!'}
+        
+        game_session.game_running = True
+        game_session.current_player = 0
+        game_session.dice_rolling = False
+        game_session.game_finished = False
+        game_session.winner = None
+        game_session.round_number = 1
+        game_session.tie_breaker_players = []
+        game_session.is_tie_breaker = False
+        
+        for player in game_session.players:
+            player.reset()
+        
+        seed = game_session.new_game_seed(requested_seed(data))
+        session_id = game_session.session_id
+        game_session.loop_generation += 1
+        game_scheduler.schedule(dice_game_loop(session_id, game_session.loop_generation), key=(session_id, 'dice'))
+        
+        mark_state_changed(game_session)
+        return {'success': True, 'seed': seed}
+
+def dice_status(game_session):
+    return {
+        'players': players_json(game_session.players),
+        'current_player': game_session.current_player,
+        'dice_rolling': game_session.dice_rolling,
+        'game_finished': game_session.game_finished,
+        'winner': player_json(game_session.winner),
+        'round_number': game_session.round_number,
+        'is_tie_breaker': game_session.is_tie_breaker,
+        'tie_breaker_players': game_session.tie_breaker_players
+    }
 
 @app.route('/api/dice/game_status')
 def dice_game_status():
     game_session = get_game_session('dice')
-    return jsonify({
-        'players': game_session['players'],
-        'current_player': game_session['current_player'],
-        'dice_rolling': game_session['dice_rolling'],
-        'game_finished': game_session['game_finished'],
-        'winner': game_session['winner'],
-        'round_number': game_session['round_number'],
-        'is_tie_breaker': game_session['is_tie_breaker'],
-        'tie_breaker_players': game_session['tie_breaker_players']
-    })
+    return status_response(game_session, dice_status)
 
 # 룰렛 게임 API
 @app.route('/api/roulette/players')
 def get_roulette_players():
     game_session = get_game_session('roulette')
-    return jsonify(game_session['players'])
+    with game_session.lock:
+        return jsonify(players_json(game_session.players))
 
-@app.route('/api/roulette/add_player', methods=['POST'])
-def add_roulette_player():
-    game_session = get_game_session('roulette')
-    data = request.get_json()
+@game_command('roulette', 'add_player')
+def add_roulette_player(game_session, data):
     name = data.get('name', '').strip()
     
-    if not name:
-        return jsonify({'success': False, 'message': '이름을 입력하세요!'})
-    
-    if len(game_session['players']) >= 10:
-        return jsonify({'success': False, 'message': '최대 10명까지 가능합니다!'})
-    
-    colors = ["#FF0000", "#00FF00", "#0080FF", "#FFFF00", "#FF8000", "#FF00FF", "#00FFFF", "#8000FF", "#FF0080", "#80FF00"]
-    
-    new_player = {
-        "name": name,
-        "color": colors[len(game_session['players']) % len(colors)]
-    }
-    
-    game_session['players'].append(new_player)
-    return jsonify({'success': True})
+    with game_session.lock:
+        if game_in_progress(game_session):
+            return {'success': False, 'message': '게임 진행 중에는 변경할 수 없습니다!'}
+        
+        if not name:
+            return {'success': False, 'message': '이름을 입력하세요!'}
+        
+        if len(game_session.players) >= 10:
+            return {'success': False, 'message': '최대 10명까지 가능합니다!'}
+        
+        new_player = RoulettePlayer(name, RACE_COLORS[len(game_session.players) % len(RACE_COLORS)])
+        
+        # 끝난 회전의 타임라인은 인원이 바뀌기 전에 정리한다
+        game_session.end_timeline(time.time())
+        game_session.players.append(new_player)
+        mark_state_changed(game_session)
+        return {'success': True}
 
-@app.route('/api/roulette/update_player', methods=['POST'])
-def update_roulette_player():
-    game_session = get_game_session('roulette')
-    data = request.get_json()
+@game_command('roulette', 'update_player')
+def update_roulette_player(game_session, data):
     index = data.get('index')
     name = data.get('name', '').strip()
     
-    if 0 <= index < len(game_session['players']) and name:
-        game_session['players'][index]['name'] = name
-        return jsonify({'success': True})
-    
-    return jsonify({'success': False})
+    with game_session.lock:
+        if 0 <= index < len(game_session.players) and name:
+            game_session.players[index].name = name
+            mark_state_changed(game_session)
+            return {'success': True}
+        
+        return {'success': False}
 
-@app.route('/api/roulette/remove_player', methods=['POST'])
-def remove_roulette_player():
-    game_session = get_game_session('roulette')
-    data = request.get_json()
+@game_command('roulette', 'remove_player')
+def remove_roulette_player(game_session, data):
     index = data.get('index')
     
-    if len(game_session['players']) <= 2:
-        return jsonify({'success': False, 'message': '최소 2명의 플레이어가 필요합니다!'})
-    
-    if 0 <= index < len(game_session['players']):
-        game_session['players'].pop(index)
-        return jsonify({'success': True})
-    
-    return jsonify({'success': False})
-
-@app.route('/api/roulette/reset', methods=['POST'])
-def reset_roulette_game():
-    game_session = get_game_session('roulette')
-    game_session['game_running'] = False
-    game_session['roulette_spinning'] = False
-    game_session['game_finished'] = False
-    game_session['winner'] = None
-    game_session['winner_index'] = -1
-    game_session['spin_angle'] = 0
-    
-    return jsonify({'success': True})
-
-@app.route('/api/roulette/start_game', methods=['POST'])
-def start_roulette_game():
-    game_session = get_game_session('roulette')
-    
-    if len(game_session['players']) < 2:
-        return jsonify({'success': False, 'message': '최소 2명의 플레이어가 필요합니다!'})
-    
-    game_session['game_running'] = True
-    game_session['roulette_spinning'] = False
-    game_session['game_finished'] = False
-    game_session['winner'] = None
-    game_session['winner_index'] = -1
-    game_session['spin_angle'] = 0
-    
-    session_id = get_session_id()
-    threading.Thread(target=roulette_game_loop, args=(session_id,), daemon=True).start()
-    
-    return jsonify({'success': True})
-
-@app.route('/api/roulette/game_status')
-def roulette_game_status():
-    game_session = get_game_session('roulette')
-    return jsonify({
-        'players': game_session['players'],
-        'roulette_spinning': game_session['roulette_spinning'],
-        'game_finished': game_session['game_finished'],
-        'winner': game_session['winner'],
-        'winner_index': game_session['winner_index'],
-        'spin_angle': game_session['spin_angle']
-    })
-
-def dice_game_loop(session_id):
-    if session_id not in game_sessions:
-        return
-    
-    game_session = game_sessions[session_id]
-    
-    while game_session['game_running'] and not game_session['game_finished']:
-        if game_session['is_tie_breaker']:
-            active_players = game_session['tie_breaker_players']
-        else:
-            active_players = list(range(len(game_session['players'])))
-        
-        current_idx = game_session['current_player']
+    with game_session.lock:
+        if game_in_progress(game_session):
+            return {'success': False, 'message': '게임 진행 중에는 변경할 수 없습니다!'}
         
-        if current_idx >= len(active_players):
-            if game_session['is_tie_breaker']:
-                tie_players = [game_session['players'][i] for i in game_session['tie_breaker_players']]
-                min_total = min(player['total'] for player in tie_players)
-                winners = [player for player in tie_players if player['total'] == min_total]
-                
-                if len(winners) == 1:
-                    game_session['winner'] = winners[0]
-                    game_session['game_finished'] = True
-                    break
-                else:
-                    game_session['tie_breaker_players'] = [
-                        i for i, player in enumerate(game_session['players']) 
-                        if player in winners
-                    ]
-                    game_session['current_player'] = 0
-                    game_session['round_number'] += 1
-                    continue
-            else:
-                min_total = min(player['total'] for player in game_session['players'])
-                winners = [player for player in game_session['players'] if player['total'] == min_total]
-                
-                if len(winners) == 1:
-                    game_session['winner'] = winners[0]
-                    game_session['game_finished'] = True
-                    break
-                else:
-                    game_session['tie_breaker_players'] = [
-                        i for i, player in enumerate(game_session['players']) 
-                        if player in winners
-                    ]
-                    game_session['is_tie_breaker'] = True
-                    game_session['current_player'] = 0
-                    game_session['round_number'] += 1
-                    
-                    for i in game_session['tie_breaker_players']:
-                        game_session['players'][i]['dice1'] = 0
-                        game_session['players'][i]['dice2'] = 0
-                        game_session['players'][i]['total'] = 0
-                    continue
+        if len(game_session.players) <= 2:
+            return {'success': False, 'message': '최소 2명의 플레이어가 필요합니다!'}
         
-        actual_player_idx = active_players[current_idx]
+        if 0 <= index < len(game_session.players):
+            game_session.end_timeline(time.time())
+            game_session.players.pop(index)
+            mark_state_changed(game_session)
+            return {'success': True}
         
-        game_session['dice_rolling'] = True
-        time.sleep(2)
+        return {'success': False}
+
+@game_command('roulette', 'reset')
+def reset_roulette_game(game_session, data):
+    with game_session.lock:
+        game_session.end_timeline(time.time())
+        game_session.game_running = False
+        game_session.roulette_spinning = False
+        game_session.game_finished = False
+        game_session.winner = None
+        game_session.winner_index = -1
+        game_session.spin_angle = 0
         
-        dice1 = random.randint(1, 6)
-        dice2 = random.randint(1, 6)
-        total = dice1 + dice2
+        mark_state_changed(game_session)
+        return {'success': True}
+
+@game_command('roulette', 'start_game')
+def start_roulette_game(game_session, data):
+    with game_session.lock:
+        if len(game_session.players) < 2:
+            return {'success': False, 'message': '최소 2명의 플레이어가 필요합니다!'}
         
-        game_session['players'][actual_player_idx]['dice1'] = dice1
-        game_session['players'][actual_player_idx]['dice2'] = dice2
-        game_session['players'][actual_player_idx]['total'] = total
+        now = time.time()
+        game_session.end_timeline(now)
+        game_session.game_running = True
+        game_session.roulette_spinning = False
+        game_session.game_finished = False
+        game_session.winner = None
+        game_session.winner_index = -1
+        game_session.spin_angle = 0
         
-        game_session['dice_rolling'] = False
-        time.sleep(1)
+        # 결과와 회전 파라미터를 한 번에 내려주고 회전은 브라우저가 직접 그린다 (서버 루프 없음)
+        seed = game_session.new_game_seed(requested_seed(data))
+        timeline = game_session.start_timeline(now)
         
-        game_session['current_player'] += 1
+        mark_state_changed(game_session)
+        return {'success': True, 'seed': seed, 'spin': timeline.spin_json(now), 'server_time': now}
+
+def roulette_status(game_session):
+    return {
+        'players': players_json(game_session.players),
+        'roulette_spinning': game_session.roulette_spinning,
+        'game_finished': game_session.game_finished,
+        'winner': player_json(game_session.winner),
+        'winner_index': game_session.winner_index,
+        'spin_angle': game_session.spin_angle,
+        'spin': roulette_spin(game_session)
+    }
+
+def roulette_spin(game_session):
+    timeline = game_session.current_timeline()
+    if timeline is None:
+        return None
+    return timeline.spin_json(game_session.timeline_started_at)
+
+@app.route('/api/roulette/game_status')
+def roulette_game_status():
+    game_session = get_game_session('roulette')
+    return status_response(game_session, roulette_status)
+
+# 주사위 게임이 도는 동안 루프만 바꾸는 필드 (이름 변경·방 열기 같은 명령은 건드리지 않는다)
+DICE_LOOP_FIELDS = (
+    'game_running', 'game_finished', 'current_player', 'dice_rolling',
+    'round_number', 'tie_breaker_players', 'is_tie_breaker'
+)
 
-def roulette_game_loop(session_id):
-    if session_id not in game_sessions:
+def save_dice_progress(game_session, generation):
+    # 루프 진행 상태를 저장하고, 루프가 이어서 쓸 세션 사본을 돌려준다.
+    # 다른 워커가 먼저 저장했으면(이름 변경·방 열기 등) DB 의 최신 상태를 다시 읽어 루프 진행 상태를
+    # 옮겨 얹고 다시 저장한다. 게임이 리셋·재시작돼 세대가 바뀌었으면 None (루프가 끝난다)
+    latest = game_session
+    for _ in range(COMMAND_RETRIES):
+        with latest.lock:
+            if latest is not game_session:
+                if not loop_owns(latest, generation) or len(latest.players) != len(game_session.players):
+                    return None
+                for field in DICE_LOOP_FIELDS:
+                    setattr(latest, field, getattr(game_session, field))
+                for player, progress in zip(latest.players, game_session.players):
+                    player.dice1, player.dice2, player.total = progress.dice1, progress.dice2, progress.total
+                    if progress is game_session.winner:
+                        latest.winner = player
+            try:
+                mark_state_changed(latest)
+                return latest
+            except StateConflict:
+                pass
+        latest = init_game_session(game_session.session_id, 'dice')
+    return None
+
+def dice_game_loop(session_id, generation):
+    game_session = game_sessions.get(session_id, 'dice')
+    if game_session is None:
         return
     
-    game_session = game_sessions[session_id]
-    
-    # 3초 대기 후 시작 (카운트다운 시간)
-    time.sleep(3.5)
-    
-    game_session['roulette_spinning'] = True
-    
-    # 더 긴 스핀 시간으로 긴장감 조성
-    spin_duration = 5.0
-    start_time = time.time()
-    
-    # 더 많은 회전으로 박진감 증대
-    final_angle = random.randint(2160, 3600)  # 6-10바퀴
+    # 굴림 결과와 동점 처리 순서는 세션 시드에서 나오는 dice_rounds 이벤트를 그대로 따른다
+    rounds = dice_rounds(game_session.game_random(), len(game_session.players))
     
-    while time.time() - start_time < spin_duration:
-        current_time = time.time() - start_time
-        progress = current_time / spin_duration
-        
-        # 더 부드러운 감속 곡선으로 긴장감 조성
-        if progress < 0.7:
-            # 처음 70%는 빠르게
-            eased_progress = progress * 0.8
-        else:
-            # 마지막 30%에서 급격히 감속
-            remaining = (progress - 0.7) / 0.3
-            eased_progress = 0.56 + (1 - 0.56) * (1 - (1 - remaining) ** 4)
+    for event in rounds:
+        with game_session.lock:
+            if not loop_owns(game_session, generation):
+                return
+            if not game_session.game_running or game_session.game_finished:
+                return
+            
+            if event[0] == 'winner':
+                game_session.winner = game_session.players[event[1]]
+                game_session.game_finished = True
+                save_dice_progress(game_session, generation)
+                return
+            
+            if event[0] == 'tie':
+                if not game_session.is_tie_breaker:
+                    game_session.is_tie_breaker = True
+                    for i in event[1]:
+                        game_session.players[i].reset()
+                game_session.tie_breaker_players = event[1]
+                game_session.current_player = 0
+                game_session.round_number += 1
+                continue
+            
+            _, player_index, dice1, dice2 = event
+            game_session.dice_rolling = True
+            game_session = save_dice_progress(game_session, generation)
+            if game_session is None:
+                return
+        yield 2
         
-        game_session['spin_angle'] = final_angle * eased_progress
+        with game_session.lock:
+            if not loop_owns(game_session, generation):
+                return
+            
+            player = game_session.players[player_index]
+            player.dice1 = dice1
+            player.dice2 = dice2
+            player.total = dice1 + dice2
+            
+            game_session.dice_rolling = False
+            game_session = save_dice_progress(game_session, generation)
+            if game_session is None:
+                return
+        yield 1
         
-        # 스핀 속도에 따른 업데이트 간격 조정
-        if progress < 0.5:
-            time.sleep(0.03)  # 빠른 구간
-        else:
-            time.sleep(0.08)  # 느린 구간
-    
-    game_session['spin_angle'] = final_angle
-    game_session['roulette_spinning'] = False
-    
-    # 정확한 세그먼트 계산
-    segment_angle = 360 / len(game_session['players'])
-    normalized_angle = (360 - (final_angle % 360)) % 360
-    winner_index = int(normalized_angle / segment_angle)
-    
-    if winner_index >= len(game_session['players']):
-        winner_index = 0
-    
-    game_session['winner_index'] = winner_index
-    game_session['winner'] = game_session['players'][winner_index]
-    
-    # 결과 발표 전 잠시 대기
-    time.sleep(1.0)
-    game_session['game_finished'] = True
+        with game_session.lock:
+            if not loop_owns(game_session, generation):
+                return
+            game_session.current_player += 1
 
 # 경마 게임 API
 @app.route('/api/horse/players')
 def get_horse_players():
     game_session = get_game_session('horse')
-    return jsonify(game_session['players'])
+    with game_session.lock:
+        game_session.advance(time.time())
+        return jsonify(players_json(game_session.players))
 
-@app.route('/api/horse/add_player', methods=['POST'])
-def add_horse_player():
-    game_session = get_game_session('horse')
-    data = request.get_json()
+@game_command('horse', 'add_player')
+def add_horse_player(game_session, data):
     name = data.get('name', '').strip()
     
-    if not name:
-        return jsonify({'success': False, 'message': '이름을 입력하세요!'})
-    
-    if len(game_session['players']) >= 10:
-        return jsonify({'success': False, 'message': '최대 10마리까지 가능합니다!'})
-    
-    colors = ["#FF0000", "#00FF00", "#0080FF", "#FFFF00", "#FF8000", "#FF00FF", "#00FFFF", "#8000FF", "#FF0080", "#80FF00"]
-    
-    new_player = {
-        "name": name,
-        "color": colors[len(game_session['players']) % len(colors)],
-        "position": 0,
-        "speed": 0
-    }
-    
-    game_session['players'].append(new_player)
-    return jsonify({'success': True})
+    with game_session.lock:
+        if game_in_progress(game_session):
+            return {'success': False, 'message': '게임 진행 중에는 변경할 수 없습니다!'}
+        
+        if not name:
+            return {'success': False, 'message': '이름을 입력하세요!'}
+        
+        if len(game_session.players) >= 10:
+            return {'success': False, 'message': '최대 10마리까지 가능합니다!'}
+        
+        new_player = HorsePlayer(name, RACE_COLORS[len(game_session.players) % len(RACE_COLORS)])
+        
+        # 끝난 경주의 타임라인은 말 수가 바뀌기 전에 정리한다
+        game_session.end_timeline(time.time())
+        game_session.players.append(new_player)
+        mark_state_changed(game_session)
+        return {'success': True}
 
-@app.route('/api/horse/update_player', methods=['POST'])
-def update_horse_player():
-    game_session = get_game_session('horse')
-    data = request.get_json()
+@game_command('horse', 'update_player')
+def update_horse_player(game_session, data):
     index = data.get('index')
     name = data.get('name', '').strip()
     
-    if 0 <= index < len(game_session['players']) and name:
-        game_session['players'][index]['name'] = name
-        return jsonify({'success': True})
-    
-    return jsonify({'success': False})
+    with game_session.lock:
+        if 0 <= index < len(game_session.players) and name:
+            game_session.players[index].name = name
+            mark_state_changed(game_session)
+            return {'success': True}
+        
+        return {'success': False}
 
-@app.route('/api/horse/remove_player', methods=['POST'])
-def remove_horse_player():
-    game_session = get_game_session('horse')
-    data = request.get_json()
+@game_command('horse', 'remove_player')
+def remove_horse_player(game_session, data):
     index = data.get('index')
     
-    if len(game_session['players']) <= 2:
-        return jsonify({'success': False, 'message': '최소 2마리가 필요합니다!'})
-    
-    if 0 <= index < len(game_session['players']):
-        game_session['players'].pop(index)
-        return jsonify({'success': True})
-    
-    return jsonify({'success': False})
+    with game_session.lock:
+        if game_in_progress(game_session):
+            return {'success': False, 'message': '게임 진행 중에는 변경할 수 없습니다!'}
+        
+        if len(game_session.players) <= 2:
+            return {'success': False, 'message': '최소 2마리가 필요합니다!'}
+        
+        if 0 <= index < len(game_session.players):
+            game_session.end_timeline(time.time())
+            game_session.players.pop(index)
+            mark_state_changed(game_session)
+            return {'success': True}
+        
+        return {'success': False}
 
-@app.route('/api/horse/set_mode', methods=['POST'])
-def set_horse_mode():
-    game_session = get_game_session('horse')
-    data = request.get_json()
+@game_command('horse', 'set_mode')
+def set_horse_mode(game_session, data):
     mode = data.get('mode')
     
-    if mode in ['first', 'last']:
-        game_session['game_mode'] = mode
-        return jsonify({'success': True})
-    
-    return jsonify({'success': False})
+    with game_session.lock:
+        if mode in ['first', 'last']:
+            game_session.game_mode = mode
+            mark_state_changed(game_session)
+            return {'success': True}
+        
+        return {'success': False}
 
-@app.route('/api/horse/reset', methods=['POST'])
-def reset_horse_game():
-    game_session = get_game_session('horse')
-    game_session['game_running'] = False
-    game_session['race_started'] = False
-    game_session['game_finished'] = False
-    game_session['winner'] = None
-    game_session['winner_index'] = -1
-    game_session['race_time'] = 0
-    
-    for player in game_session['players']:
-        player['position'] = 0
-        player['speed'] = 0
-    
-    return jsonify({'success': True})
+@game_command('horse', 'reset')
+def reset_horse_game(game_session, data):
+    with game_session.lock:
+        game_session.end_timeline(time.time())
+        game_session.game_running = False
+        game_session.race_started = False
+        game_session.game_finished = False
+        game_session.winner = None
+        game_session.winner_index = -1
+        game_session.race_time = 0
+        
+        for player in game_session.players:
+            player.reset()
+        
+        mark_state_changed(game_session)
+        return {'success': True}
 
-@app.route('/api/horse/start_game', methods=['POST'])
-def start_horse_game():
-    game_session = get_game_session('horse')
-    
-    if len(game_session['players']) < 2:
-        return jsonify({'success': False, 'message': '최소 2마리가 필요합니다!'})
-    
-    # 완전한 게임 상태 초기화
-    game_session['game_running'] = True
-    game_session['race_started'] = False
-    game_session['game_finished'] = False
-    game_session['winner'] = None
-    game_session['winner_index'] = -1
-    game_session['race_time'] = 0
-    
-    # 모든 플레이어 데이터 완전 초기화
-    for player in game_session['players']:
-        player['position'] = 0
-        player['speed'] = 0
-    
-    session_id = get_session_id()
-    threading.Thread(target=horse_race_loop, args=(session_id,), daemon=True).start()
-    
-    return jsonify({'success': True})
+@game_command('horse', 'start_game')
+def start_horse_game(game_session, data):
+    with game_session.lock:
+        if len(game_session.players) < 2:
+            return {'success': False, 'message': '최소 2마리가 필요합니다!'}
+        
+        # 완전한 게임 상태 초기화
+        now = time.time()
+        game_session.end_timeline(now)
+        game_session.game_running = True
+        game_session.race_started = False
+        game_session.game_finished = False
+        game_session.winner = None
+        game_session.winner_index = -1
+        game_session.race_time = 0
+        
+        # 모든 플레이어 데이터 완전 초기화
+        for player in game_session.players:
+            player.reset()
+        
+        # 경주 전체를 시드 하나로 미리 계산해 두고, 진행 상황은 시간으로 프레임을 찾아 보여준다
+        game_session.race_mode = game_session.game_mode
+        seed = game_session.new_game_seed(requested_seed(data))
+        game_session.start_timeline(now)
+        
+        mark_state_changed(game_session)
+        return {'success': True, 'seed': seed}
+
+def horse_status(game_session):
+    return {
+        'players': players_json(game_session.players),
+        'race_started': game_session.race_started,
+        'game_finished': game_session.game_finished,
+        'winner': player_json(game_session.winner),
+        'winner_index': game_session.winner_index,
+        'game_mode': game_session.game_mode,
+        'race_time': game_session.race_time
+    }
 
 @app.route('/api/horse/game_status')
 def horse_game_status():
     game_session = get_game_session('horse')
-    return jsonify({
-        'players': game_session['players'],
-        'race_started': game_session['race_started'],
-        'game_finished': game_session['game_finished'],
-        'winner': game_session['winner'],
-        'winner_index': game_session['winner_index'],
-        'game_mode': game_session['game_mode'],
-        'race_time': game_session['race_time']
-    })
-
-def horse_race_loop(session_id):
-    if session_id not in game_sessions:
-        return
-    
-    game_session = game_sessions[session_id]
-    
-    # 카운트다운
-    time.sleep(3.5)
-    game_session['race_started'] = True
-    
-    race_distance = 100
-    start_time = time.time()
-    finish_times = {}  # 각 말의 결승선 도달 시간 기록
-    
-    while game_session['game_running'] and not game_session['game_finished']:
-        current_time = time.time()
-        game_session['race_time'] = current_time - start_time
-        
-        # 각 말의 속도와 위치 업데이트
-        for i, player in enumerate(game_session['players']):
-            # 랜덤한 속도 변화로 박진감 연출
-            speed_change = random.uniform(-0.8, 1.5)
-            player['speed'] = max(0.2, min(2.5, player['speed'] + speed_change))
-            
-            # 위치 업데이트
-            player['position'] += player['speed'] * 0.3
-            
-            # 결승선 도달 시 시간 기록 및 위치 고정
-            if player['position'] >= race_distance and i not in finish_times:
-                finish_times[i] = current_time - start_time
-                player['position'] = race_distance
-        
-        # 모든 말이 결승선에 도달했는지 체크
-        if len(finish_times) == len(game_session['players']):
-            if game_session['game_mode'] == 'first':
-                # 1등 모드: 가장 빨리 도달한 말
-                winner_idx = min(finish_times.keys(), key=lambda x: finish_times[x])
-            else:
-                # 꼴등 모드: 가장 늦게 도달한 말
-                winner_idx = max(finish_times.keys(), key=lambda x: finish_times[x])
-            
-            game_session['winner'] = game_session['players'][winner_idx]
-            game_session['winner_index'] = winner_idx
-            game_session['game_finished'] = True
-            break
-        
-        time.sleep(0.1)
+    return status_response(game_session, horse_status)
 
 # 사다리 게임 API
 @app.route('/api/ladder/players')
 def get_ladder_players():
     game_session = get_game_session('ladder')
-    return jsonify(game_session['players'])
+    with game_session.lock:
+        game_session.advance(time.time())
+        return jsonify(players_json(game_session.players))
 
-@app.route('/api/ladder/add_player', methods=['POST'])
-def add_ladder_player():
-    game_session = get_game_session('ladder')
-    data = request.get_json()
+@game_command('ladder', 'add_player')
+def add_ladder_player(game_session, data):
     name = data.get('name', '').strip()
     
-    if not name:
-        return jsonify({'success': False, 'message': '이름을 입력하세요!'})
-    
-    if len(game_session['players']) >= 10:
-        return jsonify({'success': False, 'message': '최대 10명까지 가능합니다!'})
-    
-    colors = ["#ff6b6b", "#4ecdc4", "#45b7d1", "#96ceb4", "#ffeaa7", "#fd79a8", "#fdcb6e", "#6c5ce7", "#a29bfe", "#e17055"]
-    
-    new_player = {
-        "name": name,
-        "position": 0,
-        "color": colors[len(game_session['players']) % len(colors)],
-        "lane": len(game_session['players']),
-        "speed": 1.0
-    }
-    
-    game_session['players'].append(new_player)
-    
-    game_session['results'] = ['통과'] * len(game_session['players'])
-    winner_index = random.randint(0, len(game_session['players']) - 1)
-    game_session['results'][winner_index] = '당첨'
-    
-    return jsonify({'success': True})
+    with game_session.lock:
+        if game_in_progress(game_session):
+            return {'success': False, 'message': '게임 진행 중에는 변경할 수 없습니다!'}
+        
+        if not name:
+            return {'success': False, 'message': '이름을 입력하세요!'}
+        
+        if len(game_session.players) >= LADDER_MAX_PLAYERS:
+            return {'success': False, 'message': '최대 10명까지 가능합니다!'}
+        
+        new_player = LadderPlayer(name, LADDER_COLORS[len(game_session.players) % len(LADDER_COLORS)], len(game_session.players))
+        
+        # 끝난 게임의 타임라인은 인원이 바뀌기 전에 정리한다
+        game_session.end_timeline(time.time())
+        game_session.players.append(new_player)
+        
+        game_session.results = draw_ladder_results(game_session)
+        
+        mark_state_changed(game_session)
+        return {'success': True}
 
-@app.route('/api/ladder/update_player', methods=['POST'])
-def update_ladder_player():
-    game_session = get_game_session('ladder')
-    data = request.get_json()
+@game_command('ladder', 'update_player')
+def update_ladder_player(game_session, data):
     index = data.get('index')
     name = data.get('name', '').strip()
     
-    if 0 <= index < len(game_session['players']) and name:
-        game_session['players'][index]['name'] = name
-        return jsonify({'success': True})
-    
-    return jsonify({'success': False})
+    with game_session.lock:
+        if 0 <= index < len(game_session.players) and name:
+            game_session.players[index].name = name
+            mark_state_changed(game_session)
+            return {'success': True}
+        
+        return {'success': False}
 
-@app.route('/api/ladder/remove_player', methods=['POST'])
-def remove_ladder_player():
-    game_session = get_game_session('ladder')
-    data = request.get_json()
+@game_command('ladder', 'remove_player')
+def remove_ladder_player(game_session, data):
     index = data.get('index')
     
-    if len(game_session['players']) <= 2:
-        return jsonify({'success': False, 'message': '최소 2명의 플레이어가 필요합니다!'})
-    
-    if 0 <= index < len(game_session['players']):
-        game_session['players'].pop(index)
-        for i, player in enumerate(game_session['players']):
-            player['lane'] = i
+    with game_session.lock:
+        if game_in_progress(game_session):
+            return {'success': False, 'message': '게임 진행 중에는 변경할 수 없습니다!'}
         
-        game_session['results'] = ['통과'] * len(game_session['players'])
-        winner_index = random.randint(0, len(game_session['players']) - 1)
-        game_session['results'][winner_index] = '당첨'
+        if len(game_session.players) <= 2:
+            return {'success': False, 'message': '최소 2명의 플레이어가 필요합니다!'}
         
-        return jsonify({'success': True})
-    
-    return jsonify({'success': False})
+        if 0 <= index < len(game_session.players):
+            game_session.end_timeline(time.time())
+            game_session.players.pop(index)
+            for i, player in enumerate(game_session.players):
+                player.lane = i
+            
+            game_session.results = draw_ladder_results(game_session)
+            
+            mark_state_changed(game_session)
+            return {'success': True}
+        
+        return {'success': False}
 
-@app.route('/api/ladder/reset', methods=['POST'])
-def reset_ladder_game():
-    game_session = get_game_session('ladder')
-    game_session['game_running'] = False
-    
-    for i, player in enumerate(game_session['players']):
-        player['position'] = 0
-        player['lane'] = i
-        player['speed'] = 1.0
-        for effect in ['spinner_effect', 'rocket_effect', 'lightning_effect', 'tornado_effect', 'freeze_effect', 'spinner_count']:
-            if effect in player:
-                del player[effect]
-    
-    game_session['results'] = ['통과'] * len(game_session['players'])
-    winner_index = random.randint(0, len(game_session['players']) - 1)
-    game_session['results'][winner_index] = '당첨'
-    
-    return jsonify({'success': True})
+@game_command('ladder', 'reset')
+def reset_ladder_game(game_session, data):
+    with game_session.lock:
+        game_session.end_timeline(time.time())
+        game_session.game_running = False
+        
+        for i, player in enumerate(game_session.players):
+            player.reset(i)
+        
+        game_session.results = draw_ladder_results(game_session)
+        
+        mark_state_changed(game_session)
+        return {'success': True}
 
 @app.route('/api/ladder/preview_results')
 def ladder_preview_results():
     game_session = get_game_session('ladder')
-    return jsonify({'results': game_session['results']})
+    with game_session.lock:
+        return jsonify({'results': game_session.results})
 
-@app.route('/api/ladder/start_game', methods=['POST'])
-def start_ladder_game():
-    game_session = get_game_session('ladder')
-    
-    if len(game_session['players']) < 2:
-        return jsonify({'success': False, 'message': '최소 2명의 플레이어가 필요합니다!'})
-    
-    game_session['game_running'] = True
-    
-    for i, player in enumerate(game_session['players']):
-        player['position'] = 0
-        player['lane'] = i
-        player['speed'] = 1.0
-        for effect in ['spinner_effect', 'rocket_effect', 'lightning_effect', 'tornado_effect', 'freeze_effect', 'spinner_count']:
-            if effect in player:
-                del player[effect]
-    
-    generate_ladder(game_session)
-    session_id = get_session_id()
-    threading.Thread(target=ladder_game_loop, args=(session_id,), daemon=True).start()
-    
-    return jsonify({'success': True, 'ladder_connections': game_session['ladder_connections'], 'results': game_session['results']})
+@game_command('ladder', 'start_game')
+def start_ladder_game(game_session, data):
+    with game_session.lock:
+        if len(game_session.players) < 2:
+            return {'success': False, 'message': '최소 2명의 플레이어가 필요합니다!'}
+        
+        now = time.time()
+        game_session.end_timeline(now)
+        game_session.game_running = True
+        
+        for i, player in enumerate(game_session.players):
+            player.reset(i)
+        
+        # 사다리 배치와 진행 전체를 시드 하나로 미리 계산해 둔다
+        seed = game_session.new_game_seed(requested_seed(data))
+        timeline = game_session.start_timeline(now)
+        game_session.ladder_connections = timeline.connections
+        
+        mark_state_changed(game_session)
+        return {'success': True, 'seed': seed, 'ladder_connections': game_session.ladder_connections, 'results': game_session.results}
 
-@app.route('/api/ladder/game_status')
-def ladder_game_status():
-    game_session = get_game_session('ladder')
+def ladder_status(game_session):
     winner = None
-    if not game_session['game_running'] and game_session['players']:
+    if not game_session.game_running and game_session.players:
         winner_lane = None
-        for i, result in enumerate(game_session['results']):
-            if result == '당첨':
+        for i, result in enumerate(game_session.results):
+            if result == RESULT_WIN:
                 winner_lane = i
                 break
         
         if winner_lane is not None:
-            for player in game_session['players']:
-                if player['lane'] == winner_lane and player['position'] >= 102:
+            for player in game_session.players:
+                if player.lane == winner_lane and player.position >= 102:
                     winner = player
                     break
     
-    return jsonify({
-        'running': game_session['game_running'],
-        'players': game_session['players'],
-        'winner': winner,
-        'results': game_session['results']
-    })
+    return {
+        'running': game_session.game_running,
+        'players': players_json(game_session.players),
+        'winner': player_json(winner),
+        'results': game_session.results
+    }
 
-def generate_ladder(game_session):
-    game_session['ladder_connections'] = [[] for _ in range(90)]
-    
-    player_count = len(game_session['players'])
-    items_per_lane = max(3, min(5, player_count))
-    
-    for lane in range(player_count):
-        available_positions = list(range(8, 82))
-        item_positions = random.sample(available_positions, min(items_per_lane, len(available_positions)))
+@app.route('/api/ladder/game_status')
+def ladder_game_status():
+    game_session = get_game_session('ladder')
+    return status_response(game_session, ladder_status)
+
+# 게임 상태 스트림 (Server-Sent Events)
+STATUS_BUILDERS = {
+    'dice': dice_status,
+    'roulette': roulette_status,
+    'horse': horse_status,
+    'ladder': ladder_status
+}
+STREAM_KEEPALIVE = 15
+# 공유 저장소에서는 다른 워커의 변경을 알림으로 받을 수 없으므로 이 간격으로 다시 조회한다
+STREAM_SHARED_POLL = 0.1
+
+def status_events(load_session, build_status):
+    # load_session 은 게임 세션을 (다시) 읽어 온다 (공유 저장소에서 다른 워커의 변경을 보려고)
+    wait_timeout = STREAM_SHARED_POLL if game_sessions.shared else STREAM_KEEPALIVE
+    game_session = load_session()
+    sent = None
+    idle = 0
+    yield b'retry: 2000\n\n'
+    while True:
+        # 루프가 상태를 바꿨을 때만 프레임을 보내고, 그 외에는 연결 유지용 주석만 보낸다.
+        # 타임라인 게임은 알림이 없으므로 다음 프레임 시각에 맞춰 깨어난다.
+        state_changed = game_session.state_changed
+        with state_changed:
+            frame_delay = game_session.next_frame_delay(time.time())
+            timeout = wait_timeout if frame_delay is None else min(wait_timeout, frame_delay)
+            changed = state_changed.wait_for(lambda: stream_identity(game_session) != sent, timeout=timeout)
+            if changed:
+                encoded = encoded_status(game_session, build_status)
+                sent = encoded.identity
+        if changed:
+            idle = 0
+            yield encoded.event
+            continue
         
-        for pos in item_positions:
-            item_type = random.choice(['spinner', 'rocket', 'lightning', 'tornado', 'freeze'])
-            game_session['ladder_connections'][pos].append({'type': item_type, 'lane': lane})
+        if game_sessions.shared:
+            game_session = load_session()
+        idle += timeout
+        if idle >= STREAM_KEEPALIVE:
+            idle = 0
+            yield b': keepalive\n\n'
 
-def ladder_game_loop(session_id):
-    if session_id not in game_sessions:
-        return
-    
-    game_session = game_sessions[session_id]
-    finish_line = 102
+def event_stream_response(events):
+    return Response(events, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/api/<game_type>/stream')
+def game_status_stream(game_type):
+    if game_type not in STATUS_BUILDERS:
+        abort(404)
     
-    update_interval = 0.15
-    while game_session['game_running']:
-        try:
-            for player in game_session['players']:
-                if 'spinner_effect' in player and player['spinner_effect'] > 0:
-                    player['spinner_effect'] -= 1
-                    near_finish_spinner = player['position'] >= (finish_line - 2.5)
-                    if not near_finish_spinner and player['spinner_count'] > 0 and player['spinner_effect'] % 3 == 0:
-                        available_lanes = [i for i in range(len(game_session['players'])) if i != player['lane']]
-                        if available_lanes:
-                            new_lane = random.choice(available_lanes)
-                            for other_player in game_session['players']:
-                                if other_player['lane'] == new_lane:
-                                    other_player['lane'] = player['lane']
-                                    break
-                            player['lane'] = new_lane
-                            player['spinner_count'] -= 1
-                
-                if 'rocket_effect' in player and player['rocket_effect'] > 0:
-                    player['rocket_effect'] -= 1
-                
-                if 'lightning_effect' in player and player['lightning_effect'] > 0:
-                    player['lightning_effect'] -= 1
-                
-                if 'tornado_effect' in player and player['tornado_effect'] > 0:
-                    player['tornado_effect'] -= 1
-                
-                if 'freeze_effect' in player and player['freeze_effect'] > 0:
-                    player['freeze_effect'] -= 1
-                
-                player['speed'] = 1.0
-                near_finish = player['position'] >= (finish_line - 2.5)
-                
-                if not near_finish and random.random() < 0.3:
-                    available_lanes = [i for i in range(len(game_session['players'])) if i != player['lane']]
-                    if available_lanes:
-                        new_lane = random.choice(available_lanes)
-                        for other_player in game_session['players']:
-                            if other_player['lane'] == new_lane:
-                                other_player['lane'] = player['lane']
-                                break
-                        player['lane'] = new_lane
-                
-                player['position'] += 1.1
-                
-                current_level = int(player['position'])
-                if current_level < len(game_session['ladder_connections']):
-                    obstacles = game_session['ladder_connections'][current_level]
-                    
-                    for obstacle in obstacles:
-                        if player['lane'] == obstacle['lane'] and abs(player['position'] - current_level) < 1:
-                            if obstacle['type'] == 'spinner':
-                                player['spinner_effect'] = 10
-                                player['spinner_count'] = 8
-                            elif obstacle['type'] == 'rocket':
-                                player['rocket_effect'] = 10
-                            elif obstacle['type'] == 'lightning':
-                                player['lightning_effect'] = 10
-                            elif obstacle['type'] == 'tornado':
-                                if not near_finish:
-                                    lanes = list(range(len(game_session['players'])))
-                                    random.shuffle(lanes)
-                                    for i, p in enumerate(game_session['players']):
-                                        p['lane'] = lanes[i]
-                                player['tornado_effect'] = 10
-                            elif obstacle['type'] == 'freeze':
-                                player['freeze_effect'] = 10
-            
-            winner_lane = -1
-            for i, result in enumerate(game_session['results']):
-                if result == '당첨':
-                    winner_lane = i
-                    break
-            
-            if winner_lane >= 0:
-                for player in game_session['players']:
-                    if player['lane'] == winner_lane and player['position'] >= 102:
-                        game_session['game_running'] = False
-                        break
-            
-            if not game_session['game_running']:
-                break
-                
-            time.sleep(update_interval)
-        except Exception:
-            game_session['game_running'] = False
-            break
+    session_id = get_session_id()
+    return event_stream_response(status_events(lambda: init_game_session(session_id, game_type), STATUS_BUILDERS[game_type]))
+
+@app.route('/api/room/<code>/stream')
+def room_status_stream(code):
+    # 관전자 스트림은 asgi.py 가 이벤트 루프에서 처리한다. WSGI 서버에서 스트림마다 워커 스레드를 계속
+    # 붙잡지 않도록 204 로 거절하면, 브라우저는 공유 스냅샷을 주는 game_status 폴링으로 바꾼다
+    get_room(code)
+    return Response(status=204)
 
 def background_cleanup():
     while True:
         time.sleep(300)
         cleanup_old_sessions()
 
+tune_gc()
+
 if __name__ == '__main__':
     cleanup_thread = threading.Thread(target=background_cleanup, daemon=True)
     cleanup_thread.start()
     
-    import os
     port = int(os.environ.get('PORT', 5000))
     app.run(debug=False, host='0.0.0.0', port=port, threaded=True)
\ No newline at end of file
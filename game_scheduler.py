@@ -0,0 +1,194 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# 스레드에서 실행한 단계가 끝까지 돌았음을 알리는 값 (StopIteration 은 Future 로 넘길 수 없다)
+_FINISHED = object()
+
+
+class _Task:
+    # 스케줄러에 등록된 게임 루프 하나. 같은 키로 새 루프가 등록되면 cancelled 로 표시된다.
+    __slots__ = ('step', 'key', 'cancelled')
+
+    def __init__(self, step, key):
+        self.step = step
+        self.key = key
+        self.cancelled = False
+
+
+class _LoopOwners:
+    # 두 스케줄러가 함께 쓰는 키별 루프 관리. key 가 주어지면 해당 키의 루프는 하나만 살아있도록 이전 루프를 취소한다.
+    # 하위 클래스는 자기 상태를 지키는 락을 넘기고, _own/_cancel_locked 는 그 락 안에서 부른다.
+
+    def __init__(self, lock):
+        self._lock = lock
+        self._owners = {}
+        self.cancelled_loops = 0
+
+    def _own(self, step, key):
+        task = _Task(step, key)
+        if key is not None:
+            self._cancel_locked(key)
+            self._owners[key] = task
+        return task
+
+    def cancel(self, key):
+        with self._lock:
+            return self._cancel_locked(key)
+
+    def _cancel_locked(self, key):
+        task = self._owners.pop(key, None)
+        if task is None:
+            return False
+        task.cancelled = True
+        self.cancelled_loops += 1
+        return True
+
+    def _release(self, task):
+        with self._lock:
+            if task.key is not None and self._owners.get(task.key) is task:
+                del self._owners[task.key]
+
+
+class GameScheduler(_LoopOwners):
+    # 모든 게임 루프를 소수의 워커 스레드에서 구동하는 스케줄러.
+    # 게임 루프는 제너레이터로 작성하고, 다음 틱까지 기다릴 시간(초)을 yield 한다.
+    # 다음 깨어날 시각 기준 힙으로 관리하므로 진행 중인 게임 수와 무관하게 스레드 수가 일정하다.
+
+    def __init__(self, workers=1):
+        self._heap = []
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        super().__init__(self._cond)
+        self._worker_count = max(1, workers)
+        self._started = False
+
+    def _start_workers(self):
+        # gunicorn 포크 이후 워커 프로세스 안에서 시작되도록 첫 예약 시점에 띄운다
+        self._started = True
+        for i in range(self._worker_count):
+            threading.Thread(target=self._run, name=f'game-scheduler-{i}', daemon=True).start()
+
+    def schedule(self, step, delay=0, key=None):
+        with self._cond:
+            if not self._started:
+                self._start_workers()
+            self._push(self._own(step, key), delay)
+
+    def _push(self, task, delay):
+        heapq.heappush(self._heap, (time.monotonic() + delay, next(self._sequence), task))
+        self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'active_loops': len(self._heap),
+                'owned_loops': len(self._owners),
+                'cancelled_loops': self.cancelled_loops,
+                'workers': self._worker_count
+            }
+
+    def _next_due(self):
+        with self._cond:
+            while True:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                wake_at = self._heap[0][0]
+                delay = wake_at - time.monotonic()
+                if delay <= 0:
+                    return heapq.heappop(self._heap)[2]
+                self._cond.wait(delay)
+
+    def _run(self):
+        while True:
+            task = self._next_due()
+            if task.cancelled:
+                task.step.close()
+                continue
+            try:
+                delay = next(task.step)
+            except StopIteration:
+                self._release(task)
+                continue
+            except Exception:
+                logger.exception('game loop step failed')
+                self._release(task)
+                continue
+            with self._cond:
+                if task.cancelled:
+                    task.step.close()
+                else:
+                    self._push(task, delay or 0)
+
+
+class AsyncGameScheduler(_LoopOwners):
+    # GameScheduler 와 같은 게임 루프 제너레이터를 asyncio 이벤트 루프에서 구동한다 (asgi.py 로 띄울 때).
+    # 게임마다 코루틴 하나가 틱 사이에 asyncio.sleep 으로 기다리므로 스레드·힙 없이 게임 수만큼 늘어난다.
+    # schedule/cancel 은 Flask 핸들러가 도는 스레드에서 불리므로 이벤트 루프에는 call_soon_threadsafe 로 넘긴다.
+
+    def __init__(self, offload_steps=False):
+        # offload_steps: 단계가 세션 락을 잡는 동안 다른 스레드가 그 락을 쥔 채 공유 저장소(SQLite)에
+        # 쓰고 있을 수 있으면, 이벤트 루프가 막히지 않게 단계를 스레드에서 실행한다
+        super().__init__(threading.Lock())
+        self.offload_steps = offload_steps
+        self._loop = None
+        self._pending = []  # 이벤트 루프가 붙기 전에 예약된 루프
+        self._running = 0
+
+    def attach(self, loop):
+        with self._lock:
+            if self._loop is loop:
+                return
+            self._loop = loop
+            pending, self._pending = self._pending, []
+        for task, delay in pending:
+            loop.call_soon_threadsafe(self._start, task, delay)
+
+    def schedule(self, step, delay=0, key=None):
+        with self._lock:
+            task = self._own(step, key)
+            loop = self._loop
+            if loop is None:
+                self._pending.append((task, delay))
+                return
+        loop.call_soon_threadsafe(self._start, task, delay)
+
+    def _start(self, task, delay):
+        self._running += 1
+        self._loop.create_task(self._drive(task, delay))
+
+    async def _drive(self, task, delay):
+        # 취소는 GameScheduler 와 같이 표시만 하고, 코루틴이 다음에 깨어날 때 끝낸다
+        try:
+            await asyncio.sleep(delay)
+            while not task.cancelled:
+                try:
+                    if self.offload_steps:
+                        delay = await asyncio.to_thread(next, task.step, _FINISHED)
+                    else:
+                        delay = next(task.step, _FINISHED)
+                except Exception:
+                    logger.exception('game loop step failed')
+                    break
+                if delay is _FINISHED:
+                    break
+                await asyncio.sleep(delay or 0)
+        finally:
+            task.step.close()
+            self._running -= 1
+            self._release(task)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'active_loops': self._running + len(self._pending),
+                'owned_loops': len(self._owners),
+                'cancelled_loops': self.cancelled_loops,
+                'engine': 'asyncio'
+            }
@@ -0,0 +1,396 @@
+import os
+import random
+import threading
+import uuid
+from collections import OrderedDict
+from types import MappingProxyType
+
+from game_timeline import HorseTimeline, LadderTimeline, RouletteTimeline
+
+# 모든 세션이 같이 쓰는 불변 테이블. 모듈을 불러올 때 한 번만 만든다.
+DICE_COLORS = ("#ff6b6b", "#4ecdc4", "#45b7d1", "#96ceb4", "#ffeaa7", "#fd79a8", "#fdcb6e")
+RACE_COLORS = ("#FF0000", "#00FF00", "#0080FF", "#FFFF00", "#FF8000", "#FF00FF", "#00FFFF", "#8000FF", "#FF0080", "#80FF00")
+LADDER_COLORS = ("#ff6b6b", "#4ecdc4", "#45b7d1", "#96ceb4", "#ffeaa7", "#fd79a8", "#fdcb6e", "#6c5ce7", "#a29bfe", "#e17055")
+
+_DEFAULT_NAMES = ("플레이어1", "플레이어2", "플레이어3", "플레이어4", "플레이어5")
+# 게임별 기본 참가자 (이름, 색)
+DEFAULT_ROSTERS = MappingProxyType({
+    'dice': tuple(zip(_DEFAULT_NAMES[:4], DICE_COLORS)),
+    'roulette': tuple(zip(_DEFAULT_NAMES[:4], DICE_COLORS)),
+    'horse': (("말1", "#FF0000"), ("말2", "#00FF00"), ("말3", "#0080FF"), ("말4", "#FFFF00")),
+    'ladder': tuple(zip(_DEFAULT_NAMES, LADDER_COLORS))
+})
+
+RESULT_PASS = '통과'
+RESULT_WIN = '당첨'
+LADDER_MAX_PLAYERS = 10
+# LADDER_RESULTS[인원][당첨 위치] -> 결과 튜플. 세션은 이 튜플을 그대로 참조하고, 결과가 바뀌면 다른 튜플로 바꿔 끼운다.
+LADDER_RESULTS = tuple(
+    tuple(tuple(RESULT_WIN if i == winner else RESULT_PASS for i in range(count)) for winner in range(count))
+    for count in range(LADDER_MAX_PLAYERS + 1)
+)
+
+
+def new_seed():
+    # 전역 random 상태를 건드리지 않는 새 게임 시드 (JSON 숫자로 그대로 주고받을 수 있는 32비트)
+    return int.from_bytes(os.urandom(4), 'big')
+
+
+# 세션 수 × 플레이어 수만큼 생기는 객체라서 모두 __slots__ 로 선언해 인스턴스 dict 를 없앤다.
+# to_json 은 API 응답과 공유 저장소에 쓰는 dict 를 슬롯에서 바로 만든다.
+
+
+class DicePlayer:
+    __slots__ = ('name', 'color', 'dice1', 'dice2', 'total')
+
+    def __init__(self, name, color, dice1=0, dice2=0, total=0):
+        self.name = name
+        self.color = color
+        self.dice1 = dice1
+        self.dice2 = dice2
+        self.total = total
+
+    def reset(self):
+        self.dice1 = 0
+        self.dice2 = 0
+        self.total = 0
+
+    def to_json(self):
+        return {'name': self.name, 'color': self.color, 'dice1': self.dice1, 'dice2': self.dice2, 'total': self.total}
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data['name'], data['color'], data['dice1'], data['dice2'], data['total'])
+
+
+class RoulettePlayer:
+    __slots__ = ('name', 'color')
+
+    def __init__(self, name, color):
+        self.name = name
+        self.color = color
+
+    def to_json(self):
+        return {'name': self.name, 'color': self.color}
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data['name'], data['color'])
+
+
+class HorsePlayer:
+    __slots__ = ('name', 'color', 'position', 'speed')
+
+    def __init__(self, name, color, position=0, speed=0):
+        self.name = name
+        self.color = color
+        self.position = position
+        self.speed = speed
+
+    def reset(self):
+        self.position = 0
+        self.speed = 0
+
+    def to_json(self):
+        return {'name': self.name, 'color': self.color, 'position': self.position, 'speed': self.speed}
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data['name'], data['color'], data['position'], data['speed'])
+
+
+# 사다리 아이템 효과 (남은 틱 수). 0 이면 효과 없음이고 JSON 에서는 빠진다.
+LADDER_EFFECTS = ('spinner_effect', 'rocket_effect', 'lightning_effect', 'tornado_effect', 'freeze_effect', 'spinner_count')
+
+
+class LadderPlayer:
+    __slots__ = ('name', 'position', 'color', 'lane', 'speed') + LADDER_EFFECTS
+
+    def __init__(self, name, color, lane, position=0, speed=1.0):
+        self.name = name
+        self.position = position
+        self.color = color
+        self.lane = lane
+        self.speed = speed
+        self.clear_effects()
+
+    def clear_effects(self):
+        self.spinner_effect = 0
+        self.rocket_effect = 0
+        self.lightning_effect = 0
+        self.tornado_effect = 0
+        self.freeze_effect = 0
+        self.spinner_count = 0
+
+    def reset(self, lane):
+        self.position = 0
+        self.lane = lane
+        self.speed = 1.0
+        self.clear_effects()
+
+    def to_json(self):
+        data = {'name': self.name, 'position': self.position, 'color': self.color, 'lane': self.lane, 'speed': self.speed}
+        for effect in LADDER_EFFECTS:
+            value = getattr(self, effect)
+            if value:
+                data[effect] = value
+        return data
+
+    @classmethod
+    def from_json(cls, data):
+        player = cls(data['name'], data['color'], data['lane'], data['position'], data['speed'])
+        for effect in LADDER_EFFECTS:
+            setattr(player, effect, data.get(effect, 0))
+        return player
+
+
+class GameSession:
+    # 게임 공통 세션 상태.
+    # 세션마다 하나의 락으로 게임 루프와 API 핸들러의 상태 변경을 직렬화하고,
+    # 상태 변경 알림용 Condition 도 같은 락을 쓴다. lock/state_changed/status_history 와
+    # 난수 생성기(rng), 타임라인 캐시(timeline, timeline_frame), 인코딩된 상태(encoded_status)는
+    # 프로세스 로컬 필드라 to_json 에 넣지 않는다.
+    # 게임의 난수는 모두 시작할 때 정한 seed 에서 나오므로 같은 시드로 한 판을 그대로 다시 재생할 수 있다.
+    __slots__ = (
+        'session_id', 'state_id', 'version', 'lock', 'state_changed', 'status_history',
+        'loop_generation', 'players', 'game_running', 'seed', 'rng',
+        'timeline_started_at', 'timeline', 'timeline_frame', 'room_code', 'encoded_status'
+    )
+    game_type = None
+    player_class = None
+    # players 외에 저장소에 그대로 저장하는 필드
+    STATE_FIELDS = (
+        'session_id', 'state_id', 'version', 'loop_generation', 'game_running',
+        'seed', 'timeline_started_at', 'room_code'
+    )
+
+    def __init__(self, session_id, players):
+        lock = threading.RLock()
+        self.session_id = session_id
+        self.state_id = uuid.uuid4().hex[:12]
+        self.version = 0
+        self.lock = lock
+        self.state_changed = threading.Condition(lock)
+        self.status_history = OrderedDict()
+        self.loop_generation = 0
+        self.players = players
+        self.game_running = False
+        self.seed = None
+        self.rng = None
+        self.timeline_started_at = None
+        self.timeline = None
+        self.timeline_frame = 0
+        self.room_code = None  # 관전방 코드 (방을 열었을 때만)
+        self.encoded_status = None
+
+    @property
+    def status_version(self):
+        # 클라이언트에게 보이는 상태 버전. 타임라인 프레임이 넘어가는 것도 상태 변경으로 센다
+        return self.version + self.timeline_frame
+
+    def new_game_seed(self, seed=None):
+        # 게임을 시작할 때마다 새 시드를 정해 저장한다
+        self.seed = new_seed() if seed is None else seed
+        self.rng = None
+        return self.seed
+
+    def game_random(self):
+        # 세션 전용 난수 생성기. 여러 스레드가 전역 random 모듈 상태를 두고 경쟁하지 않는다.
+        # 필요할 때 처음 만들어서, 게임을 하지 않는 세션은 생성기 상태(약 2.5KB)를 들고 있지 않는다.
+        if self.rng is None:
+            self.rng = random.Random(self.seed)
+        return self.rng
+
+    def build_timeline(self):
+        return None
+
+    def apply_frame(self, timeline, frame):
+        pass
+
+    def current_timeline(self):
+        # 시드만 저장해 두고 타임라인은 프로세스마다 처음 필요할 때 다시 계산한다
+        if self.timeline is None and self.timeline_started_at is not None:
+            self.timeline = self.build_timeline()
+        return self.timeline
+
+    def start_timeline(self, now):
+        # 현재 시드로 게임 전체를 미리 계산한다
+        self.timeline_started_at = now
+        self.timeline = None
+        self.timeline_frame = 0
+        return self.current_timeline()
+
+    def advance(self, now):
+        # now 시점의 타임라인 프레임을 세션 필드에 반영하고 프레임 번호를 돌려준다 (세션 락 안에서 호출)
+        timeline = self.current_timeline()
+        if timeline is None:
+            return 0
+        frame = timeline.frame_index(now - self.timeline_started_at)
+        if frame != self.timeline_frame:
+            self.apply_frame(timeline, frame)
+            self.timeline_frame = frame
+        return frame
+
+    def next_frame_delay(self, now):
+        timeline = self.current_timeline()
+        if timeline is None:
+            return None
+        return timeline.next_frame_delay(now - self.timeline_started_at)
+
+    def end_timeline(self, now):
+        # 타임라인이 가리키던 상태를 필드에 남기고 끝낸다.
+        # 지나간 프레임 수를 버전에 더해 두어 상태 버전이 뒤로 가지 않게 한다.
+        self.version += self.advance(now)
+        self.timeline_started_at = None
+        self.timeline = None
+        self.timeline_frame = 0
+
+    def to_json(self):
+        data = {field: getattr(self, field) for field in self.STATE_FIELDS}
+        data['game_type'] = self.game_type
+        data['players'] = [player.to_json() for player in self.players]
+        return data
+
+    @classmethod
+    def from_json(cls, data):
+        game_session = cls(data['session_id'], [cls.player_class.from_json(p) for p in data['players']])
+        for field in cls.STATE_FIELDS:
+            setattr(game_session, field, data[field])
+        return game_session
+
+
+class RankedSession(GameSession):
+    # 우승자가 있는 게임. winner 는 players 중 하나를 가리킨다.
+    __slots__ = ('game_finished', 'winner')
+
+    def __init__(self, session_id, players):
+        super().__init__(session_id, players)
+        self.game_finished = False
+        self.winner = None
+
+    def to_json(self):
+        data = super().to_json()
+        data['winner'] = self.winner.to_json() if self.winner is not None else None
+        return data
+
+    @classmethod
+    def from_json(cls, data):
+        game_session = super().from_json(data)
+        if data['winner'] is not None:
+            game_session.winner = cls.player_class.from_json(data['winner'])
+        return game_session
+
+
+class DiceSession(RankedSession):
+    __slots__ = ('current_player', 'dice_rolling', 'round_number', 'tie_breaker_players', 'is_tie_breaker')
+    game_type = 'dice'
+    player_class = DicePlayer
+    STATE_FIELDS = GameSession.STATE_FIELDS + (
+        'game_finished', 'current_player', 'dice_rolling', 'round_number', 'tie_breaker_players', 'is_tie_breaker'
+    )
+
+    def __init__(self, session_id, players):
+        super().__init__(session_id, players)
+        self.current_player = 0
+        self.dice_rolling = False
+        self.round_number = 1
+        self.tie_breaker_players = []
+        self.is_tie_breaker = False
+
+
+class RouletteSession(RankedSession):
+    __slots__ = ('roulette_spinning', 'winner_index', 'spin_angle')
+    game_type = 'roulette'
+    player_class = RoulettePlayer
+    STATE_FIELDS = GameSession.STATE_FIELDS + ('game_finished', 'roulette_spinning', 'winner_index', 'spin_angle')
+
+    def __init__(self, session_id, players):
+        super().__init__(session_id, players)
+        self.roulette_spinning = False
+        self.winner_index = -1
+        self.spin_angle = 0
+
+    def build_timeline(self):
+        return RouletteTimeline(self.seed, len(self.players))
+
+    def apply_frame(self, timeline, frame):
+        self.roulette_spinning = frame == 1
+        if frame >= 2:
+            self.spin_angle = timeline.final_angle
+            self.winner_index = timeline.winner_index
+            self.winner = self.players[timeline.winner_index]
+        self.game_finished = timeline.finished(frame)
+
+
+class HorseSession(RankedSession):
+    __slots__ = ('race_started', 'winner_index', 'game_mode', 'race_mode', 'race_time')
+    game_type = 'horse'
+    player_class = HorsePlayer
+    STATE_FIELDS = GameSession.STATE_FIELDS + (
+        'game_finished', 'race_started', 'winner_index', 'game_mode', 'race_mode', 'race_time'
+    )
+
+    def __init__(self, session_id, players):
+        super().__init__(session_id, players)
+        self.race_started = False
+        self.winner_index = -1
+        self.game_mode = 'first'
+        # 진행 중인 경주의 우승 판정 모드 (출발할 때의 game_mode)
+        self.race_mode = 'first'
+        self.race_time = 0
+
+    def build_timeline(self):
+        return HorseTimeline(self.seed, len(self.players), self.race_mode)
+
+    def apply_frame(self, timeline, frame):
+        for player, position, speed in zip(self.players, timeline.positions_at(frame), timeline.speeds_at(frame)):
+            player.position = position
+            player.speed = speed
+        self.race_started = frame > 0
+        self.race_time = timeline.race_time(frame)
+        if timeline.finished(frame):
+            self.winner_index = timeline.winner_index
+            self.winner = self.players[timeline.winner_index]
+            self.game_finished = True
+
+
+class LadderSession(GameSession):
+    __slots__ = ('ladder_connections', 'results')
+    game_type = 'ladder'
+    player_class = LadderPlayer
+    STATE_FIELDS = GameSession.STATE_FIELDS + ('ladder_connections', 'results')
+
+    def __init__(self, session_id, players, results=()):
+        super().__init__(session_id, players)
+        self.ladder_connections = []
+        self.results = results
+
+    def build_timeline(self):
+        return LadderTimeline(self.seed, len(self.players))
+
+    def apply_frame(self, timeline, frame):
+        position = timeline.position_at(frame)
+        lanes = timeline.lanes_at(frame)
+        effects = timeline.effects_at(frame)
+        for i, player in enumerate(self.players):
+            player.position = position
+            player.lane = lanes[i]
+            player.speed = 1.0
+            for j, effect in enumerate(LADDER_EFFECTS):
+                setattr(player, effect, effects[i * len(LADDER_EFFECTS) + j])
+        if timeline.finished(frame):
+            self.game_running = False
+
+    @classmethod
+    def from_json(cls, data):
+        # 저장소에서 읽은 결과 목록도 공유 튜플로 되돌린다
+        game_session = super().from_json(data)
+        results = data['results']
+        if RESULT_WIN in results:
+            game_session.results = LADDER_RESULTS[len(results)][results.index(RESULT_WIN)]
+        else:
+            game_session.results = tuple(results)
+        return game_session
+
+
+SESSION_CLASSES = {cls.game_type: cls for cls in (DiceSession, RouletteSession, HorseSession, LadderSession)}
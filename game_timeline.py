@@ -0,0 +1,273 @@
+import bisect
+import random
+from array import array
+from types import MappingProxyType
+
+# 사다리 아이템 배치
+LADDER_LEVELS = 90
+LADDER_ITEM_TYPES = ('spinner', 'rocket', 'lightning', 'tornado', 'freeze')
+LADDER_ITEM_LEVELS = tuple(range(8, 82))
+# LadderTimeline.effects 안에서 플레이어별 효과 순서 (game_state.LADDER_EFFECTS 와 같다)
+SPINNER, ROCKET, LIGHTNING, TORNADO, FREEZE, SPINNER_COUNT = range(6)
+EFFECT_COUNT = 6
+
+
+class Timeline:
+    # 게임 시작 시 시드 하나로 끝까지 미리 계산해 둔 진행 기록.
+    # 프레임 0 은 첫 틱 이전 상태이고, 프레임 k 는 k 번째 틱이 끝난 상태이며 마지막 프레임에서 게임이 끝난다.
+    # 조회는 경과 시간으로 프레임 번호를 찾기만 하므로 진행 중에 서버가 하는 일이 없다.
+    __slots__ = ('frame_count',)
+    start_delay = 0.0
+    interval = 0.1
+
+    def frame_index(self, elapsed):
+        if elapsed < self.start_delay:
+            return 0
+        return min(int((elapsed - self.start_delay) / self.interval) + 1, self.frame_count)
+
+    def next_frame_delay(self, elapsed):
+        # 다음 프레임까지 남은 시간(초). 마지막 프레임이면 None
+        frame = self.frame_index(elapsed)
+        if frame >= self.frame_count:
+            return None
+        return max(0.001, self.start_delay + frame * self.interval - elapsed)
+
+    def finished(self, frame):
+        return frame >= self.frame_count
+
+
+class HorseTimeline(Timeline):
+    __slots__ = ('player_count', 'positions', 'speeds', 'winner_index')
+    # 카운트다운 뒤 0.1초마다 한 틱
+    start_delay = 3.5
+    interval = 0.1
+    RACE_DISTANCE = 100
+
+    def __init__(self, seed, player_count, game_mode):
+        rng = random.Random(seed)
+        self.player_count = player_count
+        # 틱마다 말 수만큼의 위치·속도를 이어 붙인 배열
+        self.positions = array('d')
+        self.speeds = array('d')
+
+        positions = [0] * player_count
+        speeds = [0] * player_count
+        finish_ticks = {}  # 각 말의 결승선 도달 틱
+        tick = 0
+        while len(finish_ticks) < player_count:
+            for i in range(player_count):
+                # 랜덤한 속도 변화로 박진감 연출
+                speeds[i] = max(0.2, min(2.5, speeds[i] + rng.uniform(-0.8, 1.5)))
+                positions[i] += speeds[i] * 0.3
+
+                # 결승선 도달 시 틱 기록 및 위치 고정
+                if positions[i] >= self.RACE_DISTANCE and i not in finish_ticks:
+                    finish_ticks[i] = tick
+                    positions[i] = self.RACE_DISTANCE
+            self.positions.extend(positions)
+            self.speeds.extend(speeds)
+            tick += 1
+
+        self.frame_count = tick
+        if game_mode == 'first':
+            # 1등 모드: 가장 빨리 도달한 말
+            self.winner_index = min(finish_ticks, key=finish_ticks.get)
+        else:
+            # 꼴등 모드: 가장 늦게 도달한 말
+            self.winner_index = max(finish_ticks, key=finish_ticks.get)
+
+    def _row(self, values, frame):
+        if frame == 0:
+            return [0] * self.player_count
+        start = (frame - 1) * self.player_count
+        return values[start:start + self.player_count]
+
+    def positions_at(self, frame):
+        return self._row(self.positions, frame)
+
+    def speeds_at(self, frame):
+        return self._row(self.speeds, frame)
+
+    def race_time(self, frame):
+        return max(0, frame - 1) * self.interval
+
+
+# 룰렛 회전 곡선. 처음 split 비율 구간은 fast_rate 배로 일정하게 돌고, 나머지 구간은 power 차수로 감속한다.
+ROULETTE_EASING = MappingProxyType({'split': 0.7, 'fast_rate': 0.8, 'power': 4})
+
+
+class RouletteTimeline(Timeline):
+    # 프레임 0: 카운트다운, 1: 회전 중, 2: 멈춤(당첨자 결정), 3: 게임 종료.
+    # 회전 중 각도는 시작 시각·최종 각도·회전 곡선으로 정해지므로 서버는 계산하지 않고 브라우저가 그린다.
+    __slots__ = ('final_angle', 'winner_index')
+    SPIN_DELAY = 3.5
+    SPIN_DURATION = 5.0
+    RESULT_DELAY = 1.0
+    FRAME_TIMES = (SPIN_DELAY, SPIN_DELAY + SPIN_DURATION, SPIN_DELAY + SPIN_DURATION + RESULT_DELAY)
+
+    def __init__(self, seed, player_count):
+        rng = random.Random(seed)
+        self.frame_count = len(self.FRAME_TIMES)
+        # 더 많은 회전으로 박진감 증대
+        self.final_angle = rng.randint(2160, 3600)  # 6-10바퀴
+
+        # 정확한 세그먼트 계산
+        segment_angle = 360 / player_count
+        normalized_angle = (360 - (self.final_angle % 360)) % 360
+        winner_index = int(normalized_angle / segment_angle)
+        if winner_index >= player_count:
+            winner_index = 0
+        self.winner_index = winner_index
+
+    def frame_index(self, elapsed):
+        return bisect.bisect_right(self.FRAME_TIMES, elapsed)
+
+    def next_frame_delay(self, elapsed):
+        frame = self.frame_index(elapsed)
+        if frame >= self.frame_count:
+            return None
+        return max(0.001, self.FRAME_TIMES[frame] - elapsed)
+
+    def spin_json(self, started_at):
+        # 브라우저가 회전 애니메이션을 직접 그리는 데 필요한 값
+        return {
+            'final_angle': self.final_angle,
+            'winner_index': self.winner_index,
+            'started_at': started_at,
+            'spin_delay': self.SPIN_DELAY,
+            'duration': self.SPIN_DURATION,
+            'result_delay': self.RESULT_DELAY,
+            'easing': dict(ROULETTE_EASING)
+        }
+
+
+def generate_ladder_items(rng, player_count):
+    connections = [[] for _ in range(LADDER_LEVELS)]
+    items_per_lane = max(3, min(5, player_count))
+
+    for lane in range(player_count):
+        item_positions = rng.sample(LADDER_ITEM_LEVELS, min(items_per_lane, len(LADDER_ITEM_LEVELS)))
+
+        for pos in item_positions:
+            item_type = rng.choice(LADDER_ITEM_TYPES)
+            connections[pos].append({'type': item_type, 'lane': lane})
+    return connections
+
+
+class LadderTimeline(Timeline):
+    __slots__ = ('player_count', 'connections', 'positions', 'lanes', 'effects')
+    interval = 0.15
+    FINISH_LINE = 102
+
+    def __init__(self, seed, player_count):
+        rng = random.Random(seed)
+        self.player_count = player_count
+        self.connections = generate_ladder_items(rng, player_count)
+        # 모든 플레이어가 틱마다 같은 거리를 내려가므로 위치는 틱마다 하나만 둔다.
+        # 레인과 효과는 틱마다 플레이어 수(× 효과 수)만큼 이어 붙인다.
+        self.positions = array('d')
+        self.lanes = array('b')
+        self.effects = array('b')
+
+        lanes = list(range(player_count))
+        effects = [[0] * EFFECT_COUNT for _ in range(player_count)]
+        position = 0
+        near_finish_line = self.FINISH_LINE - 2.5
+
+        def move_to_random_lane(i):
+            available_lanes = [lane for lane in range(player_count) if lane != lanes[i]]
+            if available_lanes:
+                new_lane = rng.choice(available_lanes)
+                for j in range(player_count):
+                    if lanes[j] == new_lane:
+                        lanes[j] = lanes[i]
+                        break
+                lanes[i] = new_lane
+
+        while position < self.FINISH_LINE:
+            near_finish = position >= near_finish_line
+            next_position = position + 1.1
+            current_level = int(next_position)
+
+            for i in range(player_count):
+                effect = effects[i]
+                if effect[SPINNER] > 0:
+                    effect[SPINNER] -= 1
+                    if not near_finish and effect[SPINNER_COUNT] > 0 and effect[SPINNER] % 3 == 0:
+                        move_to_random_lane(i)
+                        effect[SPINNER_COUNT] -= 1
+
+                for kind in (ROCKET, LIGHTNING, TORNADO, FREEZE):
+                    if effect[kind] > 0:
+                        effect[kind] -= 1
+
+                if not near_finish and rng.random() < 0.3:
+                    move_to_random_lane(i)
+
+                if current_level < LADDER_LEVELS:
+                    for obstacle in self.connections[current_level]:
+                        if lanes[i] != obstacle['lane']:
+                            continue
+                        if obstacle['type'] == 'spinner':
+                            effect[SPINNER] = 10
+                            effect[SPINNER_COUNT] = 8
+                        elif obstacle['type'] == 'rocket':
+                            effect[ROCKET] = 10
+                        elif obstacle['type'] == 'lightning':
+                            effect[LIGHTNING] = 10
+                        elif obstacle['type'] == 'tornado':
+                            if not near_finish:
+                                shuffled = list(range(player_count))
+                                rng.shuffle(shuffled)
+                                lanes[:] = shuffled
+                            effect[TORNADO] = 10
+                        elif obstacle['type'] == 'freeze':
+                            effect[FREEZE] = 10
+
+            position = next_position
+            self.positions.append(position)
+            self.lanes.extend(lanes)
+            for effect in effects:
+                self.effects.extend(effect)
+
+        self.frame_count = len(self.positions)
+
+    def position_at(self, frame):
+        return self.positions[frame - 1] if frame > 0 else 0
+
+    def lanes_at(self, frame):
+        if frame == 0:
+            return list(range(self.player_count))
+        start = (frame - 1) * self.player_count
+        return self.lanes[start:start + self.player_count]
+
+    def effects_at(self, frame):
+        size = self.player_count * EFFECT_COUNT
+        if frame == 0:
+            return [0] * size
+        start = (frame - 1) * size
+        return self.effects[start:start + size]
+
+
+def dice_rounds(rng, player_count):
+    # 주사위 게임 진행을 이벤트로 내놓는다. 게임 루프와 오프라인 재생이 이 함수를 같이 써서
+    # 같은 시드면 같은 순서로 난수를 뽑는다.
+    #   ('roll', 플레이어 번호, 주사위1, 주사위2)
+    #   ('tie', 동점자 번호 목록) - 합계가 가장 낮은 플레이어가 여럿이면 그들끼리 다시 굴린다
+    #   ('winner', 플레이어 번호)
+    totals = [0] * player_count
+    active_players = list(range(player_count))
+    while True:
+        for i in active_players:
+            dice1 = rng.randint(1, 6)
+            dice2 = rng.randint(1, 6)
+            totals[i] = dice1 + dice2
+            yield 'roll', i, dice1, dice2
+
+        min_total = min(totals[i] for i in active_players)
+        winners = [i for i in active_players if totals[i] == min_total]
+        if len(winners) == 1:
+            yield 'winner', winners[0]
+            return
+        active_players = winners
+        yield 'tie', winners
@@ -0,0 +1,52 @@
+import gc
+import threading
+import time
+
+# 요청 처리 중에는 짧게 살다 사라지는 객체가 많으므로 0세대 임계값을 높여 수집 빈도를 줄인다
+GC_THRESHOLDS = (50000, 20, 100)
+
+
+class GcPauseTracker:
+    # gc.callbacks 로 세대별 수집 횟수와 정지 시간을 기록한다
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started_at = None
+        self.collections = [0, 0, 0]
+        self.total_pause = 0.0
+        self.max_pause = 0.0
+
+    def __call__(self, phase, info):
+        if phase == 'start':
+            self._started_at = time.perf_counter()
+            return
+        if self._started_at is None:
+            return
+        pause = time.perf_counter() - self._started_at
+        self._started_at = None
+        with self._lock:
+            self.collections[info['generation']] += 1
+            self.total_pause += pause
+            self.max_pause = max(self.max_pause, pause)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'collections': list(self.collections),
+                'total_pause_ms': round(self.total_pause * 1000, 3),
+                'max_pause_ms': round(self.max_pause * 1000, 3),
+                'frozen_objects': gc.get_freeze_count(),
+                'thresholds': list(gc.get_threshold())
+            }
+
+
+gc_pause_tracker = GcPauseTracker()
+
+
+def tune_gc(thresholds=GC_THRESHOLDS):
+    # 부팅 시 한 번 호출한다. 지금까지 만들어진 모듈·앱 객체는 영구 세대로 옮겨 이후 수집 대상에서 빼고
+    # (gunicorn 포크 후에도 페이지가 공유된 채로 남는다), 임계값을 조정하고 정지 시간 측정을 시작한다.
+    gc.freeze()
+    gc.set_threshold(*thresholds)
+    if gc_pause_tracker not in gc.callbacks:
+        gc.callbacks.append(gc_pause_tracker)
@@ -0,0 +1,75 @@
+# start_game 응답의 seed 로 게임 결과를 서버 없이 다시 계산한다 (버그 재현·부하 테스트 검증용).
+# 사용법: python replay_game.py dice 12345 --players 4
+#         python replay_game.py horse 12345 --players 5 --mode last
+#         python replay_game.py ladder 12345 --players 3 --winner-lane 1
+import argparse
+import random
+
+from game_state import DEFAULT_ROSTERS, LADDER_RESULTS, RESULT_WIN
+from game_timeline import HorseTimeline, LadderTimeline, RouletteTimeline, dice_rounds
+
+
+def player_names(game_type, count):
+    names = [name for name, _ in DEFAULT_ROSTERS[game_type]]
+    return [names[i] if i < len(names) else f'플레이어{i + 1}' for i in range(count)]
+
+
+def replay_dice(seed, names):
+    for event in dice_rounds(random.Random(seed), len(names)):
+        if event[0] == 'roll':
+            _, i, dice1, dice2 = event
+            print(f'{names[i]}: {dice1} + {dice2} = {dice1 + dice2}')
+        elif event[0] == 'tie':
+            print('동점 재대결:', ', '.join(names[i] for i in event[1]))
+        else:
+            print('당첨:', names[event[1]])
+
+
+def replay_roulette(seed, names):
+    timeline = RouletteTimeline(seed, len(names))
+    print(f'최종 각도: {timeline.final_angle}')
+    print('당첨:', names[timeline.winner_index])
+
+
+def replay_horse(seed, names, mode):
+    timeline = HorseTimeline(seed, len(names), mode)
+    print(f'경주 시간: {timeline.race_time(timeline.frame_count):.1f}초 ({timeline.frame_count}틱)')
+    print('당첨:', names[timeline.winner_index])
+
+
+def replay_ladder(seed, names, winner_lane):
+    # 결과 배치(당첨 레인)는 게임 시작 전에 화면에 이미 보이므로 시드가 아니라 인자로 받는다
+    count = len(names)
+    results = LADDER_RESULTS[count][winner_lane]
+    timeline = LadderTimeline(seed, count)
+    lanes = timeline.lanes_at(timeline.frame_count)
+    for i, name in enumerate(names):
+        print(f'{name}: 레인 {lanes[i]} → {results[lanes[i]]}')
+    winners = [names[i] for i in range(count) if results[lanes[i]] == RESULT_WIN]
+    print('당첨:', ', '.join(winners))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='시드로 게임 결과 재생')
+    parser.add_argument('game', choices=('dice', 'roulette', 'horse', 'ladder'))
+    parser.add_argument('seed', type=int)
+    parser.add_argument('--players', type=int, default=4)
+    parser.add_argument('--mode', choices=('first', 'last'), default='first', help='경마 모드')
+    parser.add_argument('--winner-lane', type=int, help='사다리 당첨 레인')
+    args = parser.parse_args()
+    if args.game == 'ladder' and args.winner_lane is None:
+        parser.error('사다리는 --winner-lane 이 필요합니다 (start_game 응답의 results 에서 당첨 위치)')
+
+    names = player_names(args.game, args.players)
+    if args.game == 'dice':
+        replay_dice(args.seed, names)
+    elif args.game == 'roulette':
+        replay_roulette(args.seed, names)
+    elif args.game == 'horse':
+        replay_horse(args.seed, names, args.mode)
+    else:
+        replay_ladder(args.seed, names, args.winner_lane)
+
+
+if __name__ == '__main__':
+    main()
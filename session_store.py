@@ -0,0 +1,407 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# 만료 처리 시 한 번에 락을 잡고 지우는 최대 세션 수
+EXPIRE_BATCH = 64
+# 새 세션을 만들 때 함께 정리하는 만료 세션 수
+EXPIRE_ON_CREATE = 2
+
+
+class _Entry:
+    # 브라우저 세션 하나. 게임 상태는 게임 종류별로 처음 쓰일 때 games 에 만들어진다.
+    __slots__ = ('games', 'last_activity')
+
+    def __init__(self, last_activity):
+        self.games = {}
+        self.last_activity = last_activity
+
+
+class SessionBackend:
+    # get_game_session 뒤에서 쓰는 세션 저장소 인터페이스.
+    # 게임 상태는 (세션 ID, 게임 종류) 두 단계로 찾으므로 한 브라우저의 여러 게임 탭이 서로의 상태를
+    # 덮어쓰지 않는다. 용량 제한·만료는 세션 단위이고, on_evict 에는 (세션 ID, 게임 종류) 키가 넘어간다.
+    # shared 가 True 인 구현은 여러 프로세스가 같은 세션을 보므로, 다른 워커의 변경을
+    # 알아채려면 get_or_create 로 다시 조회해야 한다.
+    shared = False
+
+    def get(self, session_id, game_type):
+        raise NotImplementedError
+
+    def get_or_create(self, session_id, game_type, factory):
+        raise NotImplementedError
+
+    def pop(self, session_id, game_type=None):
+        # game_type 이 None 이면 세션의 모든 게임 상태를 지운다
+        raise NotImplementedError
+
+    def expire(self, now=None):
+        raise NotImplementedError
+
+    def save(self, session_id, game_type, game_session):
+        # 게임 상태가 바뀐 뒤 호출된다. 프로세스 메모리에만 두는 저장소는 할 일이 없다.
+        return True
+
+    def add_room(self, code, session_id, game_type):
+        # 관전방 코드를 게임 상태에 연결한다. 이미 쓰이는 코드면 False
+        raise NotImplementedError
+
+    def find_room(self, code):
+        # 관전방 코드의 게임 상태. 방장 세션이 없어졌으면 None
+        raise NotImplementedError
+
+    def stats(self):
+        raise NotImplementedError
+
+
+class SessionStore:
+    # 게임 세션 저장소. 조회·생성·용량 제한·만료가 모두 같은 락 하나를 한 번만 잡고 처리되므로
+    # 락 안에서 다시 락을 잡는 경로가 없다. 순서는 LRU(최근 접근한 세션이 끝)로 유지한다.
+    # 타임아웃이 모든 세션에 같으므로 LRU 순서가 곧 만료 순서이고, 만료는 맨 앞에서부터
+    # 실제로 만료된 세션만 꺼내면 된다 (전체 순회 없음).
+
+    def __init__(self, max_sessions, timeout, on_evict=None):
+        self.max_sessions = max_sessions
+        self.timeout = timeout
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._on_evict = on_evict
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __contains__(self, session_id):
+        return session_id in self._sessions
+
+    def get(self, session_id, game_type):
+        # 읽기 전용 조회는 락 없이 처리한다 (dict.get 은 GIL 아래에서 원자적)
+        entry = self._sessions.get(session_id)
+        return entry.games.get(game_type) if entry is not None else None
+
+    def get_or_create(self, session_id, game_type, factory):
+        now = time.time()
+        evicted = []
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                entry.last_activity = now
+                self._sessions.move_to_end(session_id)
+            else:
+                evicted = self._expire_locked(now, EXPIRE_ON_CREATE)
+                if len(self._sessions) >= self.max_sessions:
+                    evicted.append(self._sessions.popitem(last=False))
+                entry = self._sessions[session_id] = _Entry(now)
+
+            game_session = entry.games.get(game_type)
+            if game_session is None:
+                game_session = entry.games[game_type] = factory()
+
+        self._notify_evicted(evicted)
+        return game_session
+
+    def pop(self, session_id, game_type=None, notify=True):
+        # notify=False 는 사본만 갈아 끼울 때 쓴다 (on_evict 를 부르지 않아 그 게임의 루프가 취소되지 않는다)
+        with self._lock:
+            if game_type is None:
+                entry = self._sessions.pop(session_id, None)
+                evicted = [(session_id, entry)] if entry is not None else []
+                game_session = None
+            else:
+                entry = self._sessions.get(session_id)
+                game_session = entry.games.pop(game_type, None) if entry is not None else None
+                evicted = []
+        if game_type is None:
+            self._notify_evicted(evicted)
+        elif game_session is not None and notify and self._on_evict is not None:
+            self._on_evict((session_id, game_type))
+        return game_session
+
+    def expire(self, now=None):
+        # 배치마다 락을 놓아서 만료 세션이 많아도 조회가 오래 막히지 않게 한다
+        now = time.time() if now is None else now
+        expired = []
+        while True:
+            with self._lock:
+                batch = self._expire_locked(now, EXPIRE_BATCH)
+            expired.extend(batch)
+            if len(batch) < EXPIRE_BATCH:
+                break
+        self._notify_evicted(expired)
+        return [session_id for session_id, _ in expired]
+
+    def _expire_locked(self, now, limit):
+        expired = []
+        deadline = now - self.timeout
+        while self._sessions and len(expired) < limit:
+            session_id, entry = next(iter(self._sessions.items()))
+            if entry.last_activity >= deadline:
+                break
+            del self._sessions[session_id]
+            expired.append((session_id, entry))
+        return expired
+
+    def _notify_evicted(self, entries):
+        # 콜백(게임 루프 취소 등)은 저장소 락을 놓은 뒤에 호출해 락 순서가 꼬이지 않게 한다
+        if self._on_evict is not None:
+            for session_id, entry in entries:
+                for game_type in entry.games:
+                    self._on_evict((session_id, game_type))
+
+
+class ShardedSessionStore(SessionBackend):
+    # 세션 ID 해시로 나눈 N 개의 SessionStore. 샤드마다 락과 LRU/만료 순서를 따로 가지므로
+    # 서로 다른 샤드의 요청은 같은 락을 두고 경쟁하지 않는다.
+    # 용량은 샤드별로 나눠 가지고(합계가 정확히 max_sessions) LRU 밀어내기도 샤드 안에서만 일어난다.
+    # 그래서 한 샤드에 세션이 몰리면 저장소 전체가 용량에 못 미쳐도 그 샤드의 오래된 세션이 밀려난다.
+
+    def __init__(self, shards, max_sessions, timeout, on_evict=None):
+        shards = max(1, min(shards, max_sessions))
+        per_shard, remainder = divmod(max_sessions, shards)
+        self._shards = tuple(
+            SessionStore(per_shard + (1 if i < remainder else 0), timeout, on_evict) for i in range(shards)
+        )
+        # 관전방 코드 -> (세션 ID, 게임 종류). 방장 세션이 없어진 방은 조회·만료 때 지운다
+        self._rooms = {}
+        self._rooms_lock = threading.Lock()
+
+    def _shard(self, session_id):
+        return self._shards[hash(session_id) % len(self._shards)]
+
+    def __len__(self):
+        return sum(len(shard) for shard in self._shards)
+
+    def __contains__(self, session_id):
+        return session_id in self._shard(session_id)
+
+    def get(self, session_id, game_type):
+        return self._shard(session_id).get(session_id, game_type)
+
+    def get_or_create(self, session_id, game_type, factory):
+        return self._shard(session_id).get_or_create(session_id, game_type, factory)
+
+    def pop(self, session_id, game_type=None):
+        return self._shard(session_id).pop(session_id, game_type)
+
+    def expire(self, now=None):
+        expired = []
+        for shard in self._shards:
+            expired.extend(shard.expire(now))
+        with self._rooms_lock:
+            closed = [code for code, key in self._rooms.items() if self.get(*key) is None]
+            for code in closed:
+                del self._rooms[code]
+        return expired
+
+    def add_room(self, code, session_id, game_type):
+        with self._rooms_lock:
+            if code in self._rooms:
+                return False
+            self._rooms[code] = (session_id, game_type)
+            return True
+
+    def find_room(self, code):
+        key = self._rooms.get(code)
+        if key is None:
+            return None
+        game_session = self.get(*key)
+        if game_session is None or game_session.room_code != code:
+            with self._rooms_lock:
+                if self._rooms.get(code) == key:
+                    del self._rooms[code]
+            return None
+        return game_session
+
+    def stats(self):
+        return {
+            'backend': 'memory',
+            'sessions': len(self),
+            'shards': len(self._shards),
+            'rooms': len(self._rooms)
+        }
+
+
+class SqliteSessionStore(SessionBackend):
+    # 같은 호스트의 gunicorn 워커들이 SQLite 파일(WAL 모드) 하나를 공유하는 세션 저장소.
+    # 게임 상태는 (세션 ID, 게임 종류) 행 하나씩이고, 만료·용량 제한은 세션 단위로 처리한다.
+    # 워커마다 살아있는 세션 객체를 로컬 SessionStore 에 캐시하고, DB 쪽 버전이 더 새로우면
+    # 다시 읽어 온다. 저장은 DB 버전보다 클 때만 갱신하므로 다른 워커가 먼저 쓴 상태를
+    # 덮어쓰지 않고, 밀린 로컬 사본은 버린다(그 사본으로 돌던 게임 루프는 저장이 밀리면 최신 상태를 다시 읽는다).
+    shared = True
+    # last_activity 갱신 쓰기를 이 간격(초)보다 자주 하지 않는다
+    TOUCH_INTERVAL = 30
+
+    def __init__(self, path, max_sessions, timeout, dump, load, identify, on_evict=None):
+        # dump(session) -> JSON 직렬화 가능한 dict, load(dict) -> session,
+        # identify(session) -> (state_id, version)
+        self.path = path
+        self.max_sessions = max_sessions
+        self.timeout = timeout
+        self._dump = dump
+        self._load = load
+        self._identify = identify
+        self._local = SessionStore(max_sessions, timeout, on_evict)
+        self._conns = threading.local()
+
+        conn = sqlite3.connect(path, timeout=5, isolation_level=None)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS game_sessions ('
+                'session_id TEXT NOT NULL, game_type TEXT NOT NULL, state_id TEXT NOT NULL, '
+                'version INTEGER NOT NULL, data TEXT NOT NULL, last_activity REAL NOT NULL, '
+                'PRIMARY KEY (session_id, game_type))'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS game_sessions_last_activity ON game_sessions (last_activity)')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS rooms ('
+                'code TEXT PRIMARY KEY, session_id TEXT NOT NULL, game_type TEXT NOT NULL)'
+            )
+        finally:
+            conn.close()
+
+    def _connect(self):
+        # 연결은 스레드마다, 그리고 포크된 워커 프로세스마다 새로 연다
+        conn = getattr(self._conns, 'conn', None)
+        if conn is None or self._conns.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._conns.conn = conn
+            self._conns.pid = os.getpid()
+        return conn
+
+    def __len__(self):
+        return self._connect().execute('SELECT COUNT(DISTINCT session_id) FROM game_sessions').fetchone()[0]
+
+    def __contains__(self, session_id):
+        row = self._connect().execute('SELECT 1 FROM game_sessions WHERE session_id = ?', (session_id,)).fetchone()
+        return row is not None
+
+    def get(self, session_id, game_type):
+        # 게임 루프는 자기를 시작한 워커의 로컬 사본만 본다
+        return self._local.get(session_id, game_type)
+
+    def get_or_create(self, session_id, game_type, factory):
+        conn = self._connect()
+        now = time.time()
+        while True:
+            row = conn.execute(
+                'SELECT state_id, version, data, last_activity FROM game_sessions WHERE session_id = ? AND game_type = ?',
+                (session_id, game_type)
+            ).fetchone()
+            if row is not None:
+                return self._refresh(conn, session_id, game_type, row, now)
+
+            game_session = factory()
+            if self._insert(conn, session_id, game_type, game_session, now):
+                self._local.pop(session_id, game_type)
+                return self._local.get_or_create(session_id, game_type, lambda: game_session)
+            # 다른 워커가 같은 게임 상태를 먼저 만들었으면 그 행을 다시 읽는다
+
+    def _refresh(self, conn, session_id, game_type, row, now):
+        # DB 행과 로컬 사본을 비교해 최신 사본을 돌려준다
+        state_id, version, data, last_activity = row
+        if now - last_activity > self.TOUCH_INTERVAL:
+            # 한 탭만 쓰고 있어도 같은 세션의 다른 게임 상태가 만료되지 않게 세션 단위로 갱신한다
+            conn.execute('UPDATE game_sessions SET last_activity = ? WHERE session_id = ?', (now, session_id))
+
+        local = self._local.get(session_id, game_type)
+        if local is not None:
+            local_state_id, local_version = self._identify(local)
+            if local_state_id == state_id and local_version >= version:
+                return self._local.get_or_create(session_id, game_type, lambda: local)
+
+        # 다른 워커가 더 새 상태를 썼다. 밀린 사본으로 도는 게임 루프는 다음 저장에서 충돌을 보고
+        # 최신 상태로 옮겨 가므로 여기서 취소하지 않는다
+        game_session = self._load(json.loads(data))
+        self._local.pop(session_id, game_type, notify=False)
+        return self._local.get_or_create(session_id, game_type, lambda: game_session)
+
+    def _insert(self, conn, session_id, game_type, game_session, now):
+        # 용량 확인·정리·삽입을 쓰기 트랜잭션 하나로 처리한다. 같은 게임 상태를 두 워커가 동시에
+        # 만들면 먼저 넣은 쪽이 남고 나중 쪽은 False 를 받는다 (덮어쓰지 않음)
+        state_id, version = self._identify(game_session)
+        data = json.dumps(self._dump(game_session))
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            new_session = conn.execute(
+                'SELECT 1 FROM game_sessions WHERE session_id = ?', (session_id,)
+            ).fetchone() is None
+            if new_session:
+                count = conn.execute('SELECT COUNT(DISTINCT session_id) FROM game_sessions').fetchone()[0]
+                if count >= self.max_sessions:
+                    conn.execute(
+                        'DELETE FROM game_sessions WHERE session_id IN '
+                        '(SELECT session_id FROM game_sessions GROUP BY session_id ORDER BY MAX(last_activity) LIMIT ?)',
+                        (count - self.max_sessions + 1,)
+                    )
+            cursor = conn.execute(
+                'INSERT INTO game_sessions (session_id, game_type, state_id, version, data, last_activity) '
+                'VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (session_id, game_type) DO NOTHING',
+                (session_id, game_type, state_id, version, data, now)
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return cursor.rowcount == 1
+
+    def save(self, session_id, game_type, game_session):
+        state_id, version = self._identify(game_session)
+        cursor = self._connect().execute(
+            'UPDATE game_sessions SET version = ?, data = ? '
+            'WHERE session_id = ? AND game_type = ? AND state_id = ? AND version < ?',
+            (version, json.dumps(self._dump(game_session)), session_id, game_type, state_id, version)
+        )
+        if cursor.rowcount == 0:
+            # 다른 워커가 먼저 갱신했거나 세션이 지워졌다. 이 사본은 더 이상 쓰지 않는다.
+            if self._local.get(session_id, game_type) is game_session:
+                self._local.pop(session_id, game_type, notify=False)
+            return False
+        return True
+
+    def pop(self, session_id, game_type=None):
+        if game_type is None:
+            self._connect().execute('DELETE FROM game_sessions WHERE session_id = ?', (session_id,))
+        else:
+            self._connect().execute(
+                'DELETE FROM game_sessions WHERE session_id = ? AND game_type = ?', (session_id, game_type)
+            )
+        return self._local.pop(session_id, game_type)
+
+    def expire(self, now=None):
+        now = time.time() if now is None else now
+        conn = self._connect()
+        conn.execute('DELETE FROM game_sessions WHERE last_activity < ?', (now - self.timeout,))
+        conn.execute(
+            'DELETE FROM rooms WHERE NOT EXISTS (SELECT 1 FROM game_sessions g '
+            'WHERE g.session_id = rooms.session_id AND g.game_type = rooms.game_type)'
+        )
+        return self._local.expire(now)
+
+    def add_room(self, code, session_id, game_type):
+        cursor = self._connect().execute(
+            'INSERT OR IGNORE INTO rooms (code, session_id, game_type) VALUES (?, ?, ?)', (code, session_id, game_type)
+        )
+        return cursor.rowcount == 1
+
+    def find_room(self, code):
+        conn = self._connect()
+        row = conn.execute(
+            'SELECT g.session_id, g.game_type, g.state_id, g.version, g.data, g.last_activity '
+            'FROM rooms r JOIN game_sessions g ON g.session_id = r.session_id AND g.game_type = r.game_type '
+            'WHERE r.code = ?', (code,)
+        ).fetchone()
+        if row is None:
+            return None
+        game_session = self._refresh(conn, row[0], row[1], row[2:], time.time())
+        return game_session if game_session.room_code == code else None
+
+    def stats(self):
+        return {
+            'backend': 'sqlite',
+            'sessions': len(self),
+            'local_sessions': len(self._local)
+        }
@@ -0,0 +1,163 @@
+// 게임 페이지(주사위·룰렛·경마·사다리)가 같이 쓰는 통신 코드: 웹소켓 명령 채널, 상태 구독(웹소켓 → SSE → 폴링),
+// 관전 모드. 각 페이지는 이 파일 다음에 const gameSocket = openGameSocket('<게임>'); 으로 채널을 연다.
+
+function escapeHtml(text) {
+    // 플레이어 이름은 방장이 정하고 관전자 화면에도 그려지므로 innerHTML 에 넣기 전에 항상 이스케이프한다
+    return String(text).replace(/[&<>"']/g, ch => ({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'})[ch]);
+}
+
+// /room/<코드> 로 열면 방장이 진행하는 게임을 보기만 하는 관전 모드
+const spectateRoom = (location.pathname.match(/^\/room\/([A-Za-z0-9]+)/) || [])[1] || null;
+
+function openGameSocket(game) {
+    // 게임 조작 명령과 상태 변경분을 웹소켓 하나로 주고받는다.
+    // 웹소켓을 지원하지 않는 서버(WSGI)에서는 연결되지 않고, 명령은 HTTP POST 로, 상태는 SSE/폴링으로 받는다.
+    // 관전자는 명령을 보내지 않고 방 스트림만 받으므로 연결하지 않는다.
+    const channel = {game: game, open: false, listeners: new Set(), pending: new Map(), nextId: 1, state: null};
+    if (!window.WebSocket || spectateRoom) return channel;
+    
+    const scheme = location.protocol === 'https:' ? 'wss' : 'ws';
+    const socket = new WebSocket(`${scheme}://${location.host}/api/${game}/ws`);
+    socket.onopen = () => {
+        channel.open = true;
+    };
+    socket.onmessage = (event) => {
+        const message = JSON.parse(event.data);
+        if (message.type === 'result') {
+            const resolve = channel.pending.get(message.id);
+            channel.pending.delete(message.id);
+            if (resolve) resolve(message.result);
+            return;
+        }
+        // 마지막으로 받은 버전 이후 바뀐 필드만 오므로 보관한 상태에 덮어쓴다
+        if (message.full) {
+            channel.state = message.state;
+        } else {
+            Object.assign(channel.state, message.changes);
+            Object.keys(message.players).forEach(index => {
+                Object.assign(channel.state.players[index], message.players[index]);
+            });
+        }
+        channel.listeners.forEach(listener => listener(channel.state));
+    };
+    socket.onclose = () => {
+        channel.open = false;
+        channel.pending.forEach(resolve => resolve({success: false}));
+        channel.pending.clear();
+        // 구독 중이던 화면은 SSE/폴링으로 이어 받는다
+        channel.listeners.forEach(listener => listener.fallback());
+        channel.listeners.clear();
+    };
+    channel.send = (command, data) => new Promise(resolve => {
+        const id = channel.nextId++;
+        channel.pending.set(id, resolve);
+        socket.send(JSON.stringify({id: id, command: command, data: data}));
+    });
+    return channel;
+}
+
+function sendCommand(command, data) {
+    if (gameSocket.open) return gameSocket.send(command, data || {});
+    return fetch(`/api/${gameSocket.game}/${command}`, {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify(data || {})
+    })
+    .then(response => response.json());
+}
+
+function subscribeGameStatus(game, pollInterval, onStatus) {
+    // 웹소켓이 열려 있으면 그 연결로 밀려오는 상태를 쓰고, 아니면 상태가 바뀔 때만 서버가 밀어주는
+    // SSE 스트림을 쓰며, 지원되지 않거나 끊기면 폴링으로 전환
+    let source = null;
+    let pollTimer = null;
+    let closed = false;
+    
+    let state = null;
+    let version = -1;
+    // 관전 중이면 방장 세션 대신 방의 상태를 받는다
+    const base = spectateRoom ? `/api/room/${spectateRoom}` : `/api/${game}`;
+    
+    function applyStatus(data) {
+        // since 이후 바뀐 필드만 받아서 마지막 상태에 덮어쓴다
+        if (data.full) {
+            state = data.state;
+        } else {
+            Object.assign(state, data.changes);
+            Object.keys(data.players).forEach(index => {
+                Object.assign(state.players[index], data.players[index]);
+            });
+        }
+        version = data.version;
+        return state;
+    }
+    
+    function startPolling() {
+        if (closed || pollTimer) return;
+        pollTimer = setInterval(() => {
+            // 관전자는 변경분 대신 전체 상태를 받는다. 모든 관전자가 같은 스냅샷 바이트와 ETag 를 공유한다
+            fetch(spectateRoom ? `${base}/game_status` : `${base}/game_status?since=${version}`)
+            .then(response => response.json())
+            .then(data => {
+                if (!closed) onStatus(spectateRoom ? data : applyStatus(data));
+            });
+        }, pollInterval);
+    }
+    
+    function startStream() {
+        if (closed) return;
+        if (window.EventSource) {
+            source = new EventSource(`${base}/stream`);
+            source.onmessage = (event) => {
+                if (!closed) onStatus(JSON.parse(event.data));
+            };
+            source.onerror = () => {
+                source.close();
+                source = null;
+                startPolling();
+            };
+        } else {
+            startPolling();
+        }
+    }
+    
+    const listener = data => {
+        if (!closed) onStatus(data);
+    };
+    listener.fallback = startStream;
+    if (gameSocket.open) {
+        gameSocket.listeners.add(listener);
+    } else {
+        startStream();
+    }
+    
+    return {
+        close() {
+            closed = true;
+            gameSocket.listeners.delete(listener);
+            if (source) source.close();
+            if (pollTimer) clearInterval(pollTimer);
+        }
+    };
+}
+
+function enterSpectatorMode() {
+    // 관전자는 설정 화면과 게임 조작 버튼 없이 방장의 게임 화면만 본다
+    document.querySelector('.header p').textContent = `관전 중 · 방 코드 ${spectateRoom}`;
+    document.getElementById('setupPanel').style.display = 'none';
+    document.getElementById('gameArea').style.display = 'block';
+    document.querySelectorAll('[onclick="backToSetup()"]').forEach(button => {
+        button.style.display = 'none';
+    });
+}
+
+function openRoom() {
+    // 관전방을 열고 링크를 보여 준다. 이미 연 방이 있으면 같은 코드가 온다
+    sendCommand('open_room')
+    .then(data => {
+        if (!data.success) return;
+        const link = `${location.origin}/room/${data.code}`;
+        document.getElementById('roomLink').textContent = `관전 링크: ${link}`;
+        if (navigator.clipboard) navigator.clipboard.writeText(link).catch(() => {});
+    });
+}
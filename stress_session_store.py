@@ -0,0 +1,81 @@
+# 여러 스레드가 동시에 세션을 만들고 조회하고 만료시켜 저장소를 MAX_SESSIONS 너머로 밀어붙인다.
+# 모든 스레드가 제한 시간 안에 끝나는지(교착 없음)와 세션 수가 용량을 넘지 않는지 확인한다.
+# 사용법: python stress_session_store.py [스레드 수] [스레드당 세션 수]
+import sys
+import threading
+import time
+import uuid
+
+from complete_game import MAX_SESSIONS, SESSION_SHARDS
+from session_store import ShardedSessionStore
+
+GAME_TYPES = ('dice', 'roulette', 'horse', 'ladder')
+# 이 시간 안에 끝나지 않은 스레드는 락에 걸린 것으로 본다
+JOIN_TIMEOUT = 60
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    per_thread = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    evicted = []
+    # 만료 콜백(게임 루프 취소 자리)에서 다시 저장소를 조회해도 락이 꼬이지 않아야 한다
+    store = ShardedSessionStore(
+        SESSION_SHARDS, MAX_SESSIONS, timeout=0.2,
+        on_evict=lambda key: evicted.append(store.get(*key))
+    )
+    oversize = []
+    peak = [0]
+    errors = []
+    done = threading.Event()
+
+    def create_sessions():
+        try:
+            for i in range(per_thread):
+                session_id = str(uuid.uuid4())
+                game_type = GAME_TYPES[i % len(GAME_TYPES)]
+                store.get_or_create(session_id, game_type, object)
+                store.get(session_id, game_type)
+                size = len(store)
+                peak[0] = max(peak[0], size)
+                if size > MAX_SESSIONS:
+                    oversize.append(size)
+        except Exception as e:
+            errors.append(e)
+
+    def expire_sessions():
+        # 백그라운드 정리 스레드처럼 계속 만료시키고, 가끔 먼 미래 시각을 넘겨 살아 있는 세션도 강제로 만료시킨다
+        rounds = 0
+        while not done.is_set():
+            rounds += 1
+            store.expire(time.time() + 3600 if rounds % 20 == 0 else None)
+            time.sleep(0.005)
+
+    workers = [threading.Thread(target=create_sessions, daemon=True) for _ in range(threads)]
+    cleaner = threading.Thread(target=expire_sessions, daemon=True)
+    started = time.perf_counter()
+    cleaner.start()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(JOIN_TIMEOUT)
+    done.set()
+    cleaner.join(JOIN_TIMEOUT)
+    elapsed = time.perf_counter() - started
+
+    stuck = sum(thread.is_alive() for thread in workers + [cleaner])
+    print(f'threads={threads} sessions={threads * per_thread} max={MAX_SESSIONS} shards={SESSION_SHARDS}')
+    print(f'elapsed={elapsed:.2f}s peak={peak[0]} live={len(store)} evicted={len(evicted)} stuck={stuck}')
+    failures = []
+    if stuck:
+        failures.append(f'{stuck} 개 스레드가 {JOIN_TIMEOUT}초 안에 끝나지 않았습니다')
+    if errors:
+        failures.append(f'예외 {len(errors)} 개: {errors[0]!r}')
+    if oversize or len(store) > MAX_SESSIONS:
+        failures.append(f'세션 수가 용량을 넘었습니다 (최대 {max(oversize + [len(store)])})')
+    if failures:
+        sys.exit('FAIL: ' + '; '.join(failures))
+    print('OK')
+
+
+if __name__ == '__main__':
+    main()